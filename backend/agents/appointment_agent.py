@@ -2,6 +2,7 @@ from typing import Annotated, TypedDict, List
 from tools.appointment.book_meeting import book_meeting
 from tools.appointment.book_appointment_ticket import book_appointment_ticket
 from tools.appointment.check_finance_availability import check_finance_availability
+from tools.appointment.find_finance_slots import find_finance_slots
 from tools.appointment.lookup_student import lookup_student
 import os
 from datetime import datetime
@@ -11,15 +12,18 @@ from langgraph.graph.message import add_messages
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import ToolMessage, SystemMessage
 from utils.date_cheat_sheet import get_date_cheat_sheet
-from graph.state import UniversityState
+from graph.state import UniversityState, RESPONSE_TAG
+from utils.context_window import abuild_agent_context
+from utils.tool_executor import execute_tool_calls, tool_message
 
 # Create the map for our manual node
 tools_map = {
     "check_finance_availability": check_finance_availability,
+    "find_finance_slots": find_finance_slots,
     "book_appointment_ticket": book_appointment_ticket,
     "lookup_student": lookup_student
 }
-tools_list = [check_finance_availability, book_appointment_ticket, lookup_student]
+tools_list = [check_finance_availability, find_finance_slots, book_appointment_ticket, lookup_student]
 
 # 1. State
 class AgentState(TypedDict):
@@ -31,14 +35,12 @@ load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 llm = ChatOpenAI(model="gpt-4o-mini", openai_api_key=api_key, temperature=0)
 
-llm_with_tools = llm.bind_tools(tools_list)
+llm_with_tools = llm.bind_tools(tools_list).with_config(tags=[RESPONSE_TAG])
 
 date_cheat_sheet = get_date_cheat_sheet()
 
 # 3. Agent Node
-def appointment_agent(state: UniversityState):
-    messages = state["messages"]
-
+async def appointment_agent(state: UniversityState):
     now = datetime.now()
     current_date_str = now.strftime("%A, %Y-%m-%d") # e.g. "Thursday, 2025-12-04"
     current_time_str = now.strftime("%H:%M")        # e.g. "13:45"
@@ -74,7 +76,9 @@ def appointment_agent(state: UniversityState):
 
         **PHASE 2: THE CONSULTATION (Scheduling)**
         4. Ask for the desired date.
-        5. *Action:* Call `check_finance_availability`.
+        5. *Action:* Call `check_finance_availability` for a single date. If the student is flexible or names
+           several days ("this week", "Tuesday or Wednesday"), call `find_finance_slots` ONCE for the whole range
+           instead of checking day by day.
         6. **Response:** "I've just checked the Finance Team's live roster for [Date]. They have confirmed the following times as available: [List Times]."
         7. Wait for user selection.
 
@@ -100,11 +104,10 @@ def appointment_agent(state: UniversityState):
         """
     ))
     
-    # Ensure system message is first
-    if not isinstance(messages[0], SystemMessage):
-        messages = [sys_msg] + messages
+    # System message first, then known facts, summary of older turns and the recent window
+    messages = await abuild_agent_context(sys_msg, state)
         
-    response = llm_with_tools.invoke(messages)
+    response = await llm_with_tools.ainvoke(messages)
     # DEBUG PRINT: Check if 'tool_calls' exists in the response
     print(f"🤖 AI Response: {response}")
     if response.tool_calls:
@@ -113,67 +116,29 @@ def appointment_agent(state: UniversityState):
         print("   --> No Tool Calls")
     return {"messages": [response]}
 
-import traceback # Import this to see the full error details
 #  Example: "You are booked for Tuesday at 2pm. Your Ticket Number is #405.
 
-def tool_node(state: AgentState):
+async def tool_node(state: AgentState):
     """
-    Executes tools safely. 
-    If a tool crashes, it catches the error and returns it as a message 
+    Executes tools concurrently on the shared tool executor.
+    If a tool crashes, the error comes back as a message
     so the graph keeps running.
     """
-    messages = state["messages"]
-    last_message = messages[-1]
-    outputs = []
-    
+    last_message = state["messages"][-1]
+
     print("\n--- 🛠️ TOOL NODE STARTED ---")
-    
+
     # Check if there are tool calls
     if not hasattr(last_message, "tool_calls") or not last_message.tool_calls:
         print("   No tool calls found in last message.")
         return {"messages": []}
-    
-    for tool_call in last_message.tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        tool_id = tool_call["id"]
-        
-        print(f"   ▶ Executing: {tool_name}")
-        print(f"   ▷ Args: {tool_args}")
 
-        result = ""
-        
-        try:
-            # 1. Check if tool exists in our map
-            if tool_name not in tools_map:
-                raise ValueError(f"Tool '{tool_name}' is not in tools_map.")
-
-            # 2. EXECUTE THE TOOL
-            # We use .invoke() which handles Pydantic validation
-            tool_instance = tools_map[tool_name]
-            result = tool_instance.invoke(tool_args)
-            
-            print(f"   ✅ Success: {str(result)[:50]}...") # Print first 50 chars
-
-        except Exception as e:
-            # 3. CATCH CRASHES
-            # We capture the full traceback to print to your terminal
-            error_trace = traceback.format_exc()
-            print(f"   ❌ CRASH IN TOOL: {e}")
-            print(f"   📝 Trace: {error_trace}")
-            
-            # Return the error to the LLM so it can apologize to the user
-            result = f"System Error executing {tool_name}: {str(e)}"
-
-        # 4. Append Result
-        outputs.append(ToolMessage(
-            content=str(result),
-            tool_call_id=tool_id,
-            name=tool_name
-        ))
-            
+    outcomes = await execute_tool_calls(last_message.tool_calls, tools_map)
+    for tool_call, result in outcomes:
+        print(f"   ✅ {tool_call['name']}: {str(result)[:50]}...") # Print first 50 chars
+
     print("--- 🛠️ TOOL NODE FINISHED ---\n")
-    return {"messages": outputs}
+    return {"messages": [tool_message(tool_call, result) for tool_call, result in outcomes]}
 
 # 5. Router Logic
 def should_continue(state: AgentState):
@@ -1,22 +1,66 @@
 # backend/agents/info_agent.py
 import os
+import re
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage
-from graph.state import UniversityState
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from graph.state import UniversityState, RESPONSE_TAG
+from utils.context_window import abuild_agent_context, facts_message
+from utils.tool_executor import execute_tool_calls, tool_message
+from utils.semantic_cache import answer_cache
 # Import the tool
 from tools.info.info_search import search_university_info
 
 # Setup LLM
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 tools = [search_university_info]
-llm_with_tools = llm.bind_tools(tools)
+tools_map = {t.name: t for t in tools}
+llm_with_tools = llm.bind_tools(tools).with_config(tags=[RESPONSE_TAG])
+
+URL_RE = re.compile(r"Source: (\S+)")
+
+# A follow-up stands alone when it is long enough and points at nothing said before
+MIN_STANDALONE_WORDS = 4
+REFERRING_WORDS = {
+    "it", "its", "that", "this", "these", "those", "there", "they", "them", "their",
+    "he", "she", "his", "her", "one", "ones", "same", "else", "also", "too", "instead",
+    "again", "above", "previous", "earlier",
+}
+FOLLOW_UP_OPENERS = ("and ", "what about", "how about", "but ", "or ")
+# Answers tied to the day they were given ("open today", "events this week") go stale
+# long before the cache TTL, so neither such questions nor such answers are cached
+RELATIVE_DATE_RE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|right now|this (?:week|weekend|month|term)"
+    r"|next (?:week|weekend|month)|upcoming)\b",
+    re.IGNORECASE,
+)
+WORD_RE = re.compile(r"[a-z']+")
+
+def latest_question(state: UniversityState):
+    """The student's latest message, if it is the last one and plain text"""
+    messages = state["messages"]
+    if not messages or not isinstance(messages[-1], HumanMessage) or not isinstance(messages[-1].content, str):
+        return None
+    return messages[-1].content.strip() or None
+
+def stands_alone(state: UniversityState, question: str) -> bool:
+    """
+    Cheap check that the question means the same without the conversation: the first
+    question always does, a follow-up only if it is not short and refers to nothing earlier.
+    """
+    if not any(isinstance(m, AIMessage) for m in state["messages"][:-1]):
+        return True
+    lowered = question.lower()
+    words = WORD_RE.findall(lowered)
+    return (
+        len(words) >= MIN_STANDALONE_WORDS
+        and not REFERRING_WORDS.intersection(words)
+        and not lowered.startswith(FOLLOW_UP_OPENERS)
+    )
 
 async def info_agent(state: UniversityState):
     """
     Agent that answers general questions by searching the university website.
     """
-    messages = state["messages"]
-    
     # System Prompt
     system_msg = SystemMessage(content="""
     You are the Northumbria University Information Assistant.
@@ -37,7 +81,31 @@ async def info_agent(state: UniversityState):
     5.  If the search results are unclear, advice them to speak to the university Ask4Help team at the reception.
     """)
     
-    context = [system_msg] + messages
+    # Near-duplicate of a question we already answered: skip the ReAct loop entirely.
+    # The cache is shared by every student, so it is left alone once the conversation
+    # holds personal facts (name, ID, payment link) that the answer could pick up, and
+    # for follow-ups that only make sense with the earlier turns.
+    question = latest_question(state)
+    question_vector = None
+    if (
+        question
+        and facts_message(state) is None
+        and stands_alone(state, question)
+        and not RELATIVE_DATE_RE.search(question)
+    ):
+        try:
+            question_vector = await answer_cache.embed(question)
+            cached = answer_cache.lookup(question_vector)
+            if cached:
+                print(f"⚡ Answer cache hit ({cached['similarity']:.2f}): {cached['question']}")
+                return {"messages": [AIMessage(content=cached["answer"])]}
+        except Exception as e:
+            print(f"Answer cache unavailable: {e}")
+            question_vector = None
+
+    context = await abuild_agent_context(system_msg, state)
+    sources = []
+    search_failed = False
     
     # --- ReAct Loop (Standard Pattern) ---
     while True:
@@ -45,6 +113,13 @@ async def info_agent(state: UniversityState):
         
         # If no tool calls, we are done
         if not response.tool_calls:
+            if (
+                question_vector is not None
+                and response.content
+                and not search_failed
+                and not RELATIVE_DATE_RE.search(response.content)
+            ):
+                answer_cache.store(question_vector, question, response.content, sources)
             # Return new messages (skipping system prompt)
             return {"messages": [response]}
         
@@ -53,12 +128,14 @@ async def info_agent(state: UniversityState):
         
         for tool_call in response.tool_calls:
             print(f"🔍 Info Agent searching: {tool_call['args']}")
-            
-            tool_result = search_university_info.invoke(tool_call['args'])
-            
-            context.append({
-                "role": "tool",
-                "content": str(tool_result),
-                "tool_call_id": tool_call['id'],
-                "name": tool_call['name']
-            })
\ No newline at end of file
+
+        # Several searches in one step run side by side
+        outcomes = await execute_tool_calls(response.tool_calls, tools_map)
+        context.extend(tool_message(tool_call, tool_result) for tool_call, tool_result in outcomes)
+
+        # Remember where the answer came from; never cache answers built on a failed search
+        for _, tool_result in outcomes:
+            text = str(tool_result)
+            sources.extend(URL_RE.findall(text))
+            if text.startswith(("Search failed", "System Error", "Error")):
+                search_failed = True
@@ -1,16 +1,36 @@
 import os
 from pydantic import BaseModel
-from typing import Literal
+from typing import Literal, Optional
 from dotenv import load_dotenv
 from graph.state import UniversityState
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage
+from utils.intent_classifier import intent_classifier
 
 load_dotenv()
 
 api_key = os.getenv("OPENAI_API_KEY")
 llm = ChatOpenAI(model="gpt-4o-mini", openai_api_key=api_key, temperature=0)
 
+# Routing counters, reported by the /stats/routing endpoint
+routing_stats = {
+    "sticky_routes": 0,            # Turns routed by context, no classification needed
+    "fast_path_routes": 0,         # Turns routed by the local intent classifier
+    "llm_classifications": 0,      # Turns that still needed the LLM classifier
+}
+
+# The Payment Agent says: "I have extracted...", "ID Card", "Biometric"
+PAYMENT_TRIGGERS = ["extracted", "id card", "biometric", "selfie", "payment", "stripe", "upload"]
+# The Appointment Agent says: "registry", "finance team", "schedule", "cohort", "roster"
+APPOINTMENT_TRIGGERS = ["registry", "finance team", "schedule", "cohort", "roster", "calendar", "meeting", "book"]
+
+def get_routing_stats():
+    """Snapshot of the routing counters, including classifications avoided"""
+    return {
+        **routing_stats,
+        "classifications_avoided": routing_stats["sticky_routes"] + routing_stats["fast_path_routes"],
+    }
+
 # Define the classification schema
 class AgentRoute(BaseModel):
     agent: Literal["payment", "reconciliation", "support", "appointment", "info"]
@@ -20,6 +40,16 @@ def orchestrator(state: UniversityState):
     """Classify which agent should handle this message"""
     
     message = state["messages"][-1]
+    user_text = message.content if isinstance(message.content, str) else str(message.content)
+
+    # Short replies to the assistant ("yes", "Monday") are routed by the question they answer
+    has_context = any(isinstance(m, AIMessage) for m in state["messages"][:-1])
+
+    # 1. Try the local classifier first - only fall back to the LLM when unsure
+    fast_route = intent_classifier.classify(user_text, has_context)
+    if fast_route:
+        routing_stats["fast_path_routes"] += 1
+        return {"agent": fast_route}
     
     # 2. Get the LAST AI MESSAGE (Context)
     # We search backwards to find what the AI asked just before this.
@@ -30,6 +60,8 @@ def orchestrator(state: UniversityState):
             last_ai_text = msg.content
             break
 
+    routing_stats["llm_classifications"] += 1
+
     # Create classifier with structured output
     classifier_llm = llm.with_structured_output(AgentRoute)
     
@@ -69,30 +101,44 @@ def orchestrator(state: UniversityState):
     ])
     
     print(f"🤖 Orchestrator classified: {result.agent} - {result.reasoning}")
+
+    # Feed the decision back so the local classifier handles it next time
+    intent_classifier.record(user_text, result.agent, has_context)
     
     return {"agent": result.agent}
 
-def router(state: UniversityState):
-    agent_route = state.get("agent", "info")
-    
+def sticky_route(state: UniversityState) -> Optional[str]:
+    """Returns the agent node implied by the last AI message, if any"""
     # 1. Get the last AI message
     last_ai_msg = ""
     for m in reversed(state["messages"]):
         if isinstance(m, AIMessage):
             last_ai_msg = m.content.lower()
             break
-            
-    # The Payment Agent says: "I have extracted...", "ID Card", "Biometric"
-    payment_triggers = ["extracted", "id card", "biometric", "selfie", "payment", "stripe", "upload"]
-    if any(word in last_ai_msg for word in payment_triggers):
+
+    if any(word in last_ai_msg for word in PAYMENT_TRIGGERS):
         print(f"STICKY ROUTER: Context is 'Payment' (Found: '{last_ai_msg[:20]}...')")
         return "payment_agent"
 
-    # The Appointment Agent says: "registry", "finance team", "schedule", "cohort", "roster"
-    appointment_triggers = ["registry", "finance team", "schedule", "cohort", "roster", "calendar", "meeting", "book"]
-    if any(word in last_ai_msg for word in appointment_triggers):
+    if any(word in last_ai_msg for word in APPOINTMENT_TRIGGERS):
         print(f"STICKY ROUTER: Context is 'Appointment' (Found: '{last_ai_msg[:20]}...')")
         return "appointment_agent"
+
+    return None
+
+def pre_router(state: UniversityState):
+    """
+    Entry point of the graph. Continuations of a payment/booking flow go straight
+    to their agent, so we only pay for a classification when there is no sticky context.
+    """
+    route = sticky_route(state)
+    if route:
+        routing_stats["sticky_routes"] += 1
+        return route
+    return "orchestrator"
+
+def router(state: UniversityState):
+    agent_route = state.get("agent", "info")
     
     # Check if we're done
     if state.get('payment_link') and state.get('payment_matched'):
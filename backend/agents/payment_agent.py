@@ -13,7 +13,10 @@ from tools.payment.verify_student_identity import verify_student_identity
 from tools.payment.verify_biometrics import verify_biometric_match
 from tools.payment.verify_payment_status import verify_payment_status
 
-from graph.state import UniversityState
+from graph.state import UniversityState, RESPONSE_TAG
+from utils.context_window import abuild_agent_context
+from utils.tool_executor import execute_tool_calls, tool_message, ToolArgumentError
+from services.vision.worker_pool import vision_pool
 
 load_dotenv()
 
@@ -30,10 +33,13 @@ class PaymentState(TypedDict):
     image_bytes: bytes
 
 payment_tools = [extract_student_info_from_image, create_payment_link, verify_student_identity, verify_biometric_match, verify_payment_status]
-llm_with_tools = llm.bind_tools(payment_tools)
+payment_tools_map = {t.name: t for t in payment_tools}
+llm_with_tools = llm.bind_tools(payment_tools).with_config(tags=[RESPONSE_TAG])
+
+# Tools whose arguments prepare_args fills from what extraction writes to state
+AFTER_EXTRACTION = {"verify_student_identity", "verify_payment_status"}
 
 async def payment_agent(state: UniversityState):
-    messages = state["messages"]
     file_url = state.get("file_url")
     live_image = state.get("live_image_url")
 
@@ -109,9 +115,34 @@ async def payment_agent(state: UniversityState):
 
     system_message = SystemMessage(content=system_message_content)
 
+    def prepare_args(tool_name, tool_args):
+        """Fills in the arguments the LLM can't know from what is already in state"""
+        if tool_name == "extract_student_info_from_image":
+            # Use the file_url from state if not passed explicitly
+            url_to_use = tool_args.get("image_url", file_url)
+            if not url_to_use:
+                raise ToolArgumentError("No image URL available for extraction.")
+            return {"image_url": url_to_use}
+
+        if tool_name == "verify_biometric_match":
+            live_image_url = tool_args.get("live_image_url", live_image)
+            if not (file_url and live_image_url):
+                raise ToolArgumentError("Missing live image or ID card URL for biometric verification.")
+            return {"live_image_url": live_image_url, "id_card_url": file_url}
+
+        if tool_name == "verify_student_identity":
+            return {"extracted_id": tool_args.get("extracted_id") or state_updates.get("student_id") or state.get("student_id")}
+
+        if tool_name == "verify_payment_status":
+            # The prompt passes 'student_id'
+            return {"student_id": tool_args.get("student_id") or state_updates.get("student_id") or state.get("student_id")}
+
+        return tool_args
+
     # 2. Invoke LLM
-    # We prepend the system message for the LLM context, but we don't save it to state
-    context = [system_message] + messages
+    # Recent turns verbatim, older ones summarized. The prompt itself is not saved to state.
+    base_context = await abuild_agent_context(system_message, state)
+    context = list(base_context)
 
     while True:
         response = await llm_with_tools.ainvoke(context)
@@ -119,8 +150,8 @@ async def payment_agent(state: UniversityState):
         # B. Check if LLM wants to stop (No tools called)
         if not response.tool_calls:
             # We are done. Return all the NEW messages we generated in this loop.
-            # We filter out the SystemMessage (index 0) and the original history
-            new_messages = context[len(messages) + 1:] + [response]
+            # We filter out the system/summary prefix and the original history
+            new_messages = context[len(base_context):] + [response]
             
             return {
                 "messages": new_messages,
@@ -129,76 +160,44 @@ async def payment_agent(state: UniversityState):
         
         # C. If Tools called, execute them and LOOP AGAIN
         context.append(response) # Add the "I want to call a tool" message
-        
-        # 3. Handle Tool Calls
-        if response.tool_calls:
-            tool_messages = []
 
-            for tool_call in response.tool_calls:
-                print(f"Tool call detected: {tool_call['name']}")
-                
+        # 3. Handle Tool Calls (concurrently, off the event loop)
+        # Calls that read what extraction writes to state wait for it; the rest run together
+        phases = [response.tool_calls]
+        if any(c["name"] == "extract_student_info_from_image" for c in response.tool_calls):
+            phases = [
+                [c for c in response.tool_calls if c["name"] not in AFTER_EXTRACTION],
+                [c for c in response.tool_calls if c["name"] in AFTER_EXTRACTION],
+            ]
+
+        results = {}
+        for phase in phases:
+            if not phase:
+                continue
+            outcomes = await execute_tool_calls(phase, payment_tools_map, prepare_args)
+
+            for tool_call, tool_result in outcomes:
                 tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                tool_result = ""
-
-                print(tool_args, "argument", state)
-                try:
-                        
-                    if tool_name == "extract_student_info_from_image":
-                        # Use the file_url from state if not passed explicitly
-                        url_to_use = tool_args.get("image_url", file_url)
-                        if url_to_use:
-                            # Run Tool
-                            ocr_data = extract_student_info_from_image.invoke({"image_url": url_to_use})
-                            tool_result = json.dumps(ocr_data)
-                            print(ocr_data, "ocr")
-
-                            # Update State (Crucial for Verification step)
-                            if isinstance(ocr_data, dict):
-                                state_updates["student_id"] = ocr_data.get("student_id")
-                                state_updates["student_name"] = ocr_data.get("full_name")
-                        else:
-                            tool_result = "Error: No image URL available for extraction."
-                    elif tool_name == "verify_biometric_match":
-                        id_card_url = file_url
-                        live_image_url = tool_args.get("live_image_url", live_image)
-                        if id_card_url and live_image_url:
-                            tool_result = verify_biometric_match.invoke({
-                                "live_image_url": live_image_url,
-                                "id_card_url": id_card_url
-                            })
-                        else:
-                            tool_result = "Error: Missing live image or ID card URL for biometric verification."
-                    elif tool_name == "verify_student_identity":
-                        s_id = tool_call["args"].get("extracted_id") or state_updates.get("student_id")
-                        tool_result = verify_student_identity.invoke({"extracted_id": s_id})
-
-                        # If verified successfully, we can store a flag in state if needed
-                        if "Verified" in str(tool_result):
-                            state_updates["student_id"] = s_id
-                    # --- 5. VERIFY PAYMENT (The New Tool) ---
-                    elif tool_name == "verify_payment_status":
-                        # The prompt passes 'student_id'
-                        s_id = tool_args.get("student_id") or state.get("student_id")
-                        tool_result = verify_payment_status.invoke({"student_id": s_id})
-
-                    elif tool_name == "create_payment_link":
-                        tool_result = create_payment_link.invoke(tool_args)
-
-                        if "http" in str(tool_result):
-                            state["payment_link"] = str(tool_result).split(": ")[-1].strip()
-                    else:
-                        tool_result = f"Unknown tool: {tool_name}"
-
-                except Exception as e:
-                    tool_result = f"Error: {e}"
-
-                # Create the Tool Message
-                context.append(ToolMessage(
-                content=str(tool_result),
-                tool_call_id=tool_call["id"],
-                name=tool_call["name"]
-                ))
-        else:
-            # No tools called, just return the AI response
-            return {"messages": [response]}
\ No newline at end of file
+                print(f"Tool call finished: {tool_name}")
+
+                # Update State (Crucial for Verification step)
+                if tool_name == "extract_student_info_from_image" and isinstance(tool_result, dict):
+                    print(tool_result, "ocr")
+                    state_updates["student_id"] = tool_result.get("student_id")
+                    state_updates["student_name"] = tool_result.get("full_name")
+                    if tool_result.get("success"):
+                        # Encode the card's face now, while the student reads the GDPR notice
+                        vision_pool.submit_background("precompute_id_card_encodings", tool_call["args"].get("image_url") or file_url)
+
+                elif tool_name == "verify_student_identity" and "Verified" in str(tool_result):
+                    state_updates["student_id"] = (
+                        tool_call["args"].get("extracted_id") or state_updates.get("student_id") or state.get("student_id")
+                    )
+
+                elif tool_name == "create_payment_link" and "http" in str(tool_result):
+                    state_updates["payment_link"] = str(tool_result).split(": ")[-1].strip()
+
+                results[tool_call["id"]] = tool_result
+
+        for tool_call in response.tool_calls:
+            context.append(tool_message(tool_call, results[tool_call["id"]]))
@@ -1,9 +1,10 @@
 # chat.py 
 
-from typing import Optional
+from typing import Optional, AsyncIterator, Dict, Any
 from langchain_core.messages import HumanMessage
-from graph.state import UniversityState
+from graph.state import UniversityState, RESPONSE_TAG
 from graph.workflow import build_graph
+from graph.checkpointer import compact_thread
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,15 +25,11 @@ try:
 except Exception as e:
     print(f"Error generating diagram: {e}")
 
-async def chat(user_input: str, thread_id: str = "chat_user_2", file_url: str="", type: Optional[str]=None):
-    """
-    Chat with the multi-agent system.
-    We let the Graph handle all orchestration and routing internally.
-    """
-    
-    # 1. Config for Memory
-    config = {"configurable": {"thread_id": thread_id}}
-    
+# Nodes whose start we report to the client as a routing decision
+AGENT_NODES = {"payment_agent", "info_agent", "appointment_agent"}
+
+def build_input_payload(user_input: str, file_url: str = "", type: Optional[str] = None):
+    """Builds the graph input for a new user turn"""
     # 1. Base Input
     input_payload = {
         "messages": [HumanMessage(content=user_input)]
@@ -46,6 +43,19 @@ async def chat(user_input: str, thread_id: str = "chat_user_2", file_url: str=""
         input_payload["live_image_url"] = file_url
         
     input_payload["type"] = type
+    return input_payload
+
+async def chat(user_input: str, thread_id: str = "chat_user_2", file_url: str="", type: Optional[str]=None):
+    """
+    Chat with the multi-agent system.
+    We let the Graph handle all orchestration and routing internally.
+    """
+    
+    # 1. Config for Memory
+    config = {"configurable": {"thread_id": thread_id}}
+    
+    # 2. Build the input for this turn
+    input_payload = build_input_payload(user_input, file_url, type)
 
     try:
         # 3. Run the Graph
@@ -56,6 +66,9 @@ async def chat(user_input: str, thread_id: str = "chat_user_2", file_url: str=""
         #   d. Run the specific Agent (handling .ainvoke vs function calls automatically)
         #   e. Return the final state
         result = await app.ainvoke(input_payload, config=config)
+
+        # Drop the intermediate steps of this turn from the checkpoint store
+        await compact_thread(thread_id)
         
         # 4. Extract Response
         last_message = result["messages"][-1]
@@ -66,4 +79,83 @@ async def chat(user_input: str, thread_id: str = "chat_user_2", file_url: str=""
     except Exception as e:
         print(f"Graph Error: {e}")
         print(f"I ran into a problem: {str(e)}", {})
-        raise e
\ No newline at end of file
+        raise e
+
+def state_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns only what changed in the state during this turn"""
+    delta = {}
+    old_messages = before.get("messages", [])
+    new_messages = after.get("messages", [])
+    delta["messages"] = new_messages[len(old_messages):]
+
+    for key, value in after.items():
+        if key != "messages" and before.get(key) != value:
+            delta[key] = value
+    return delta
+
+def tool_status(output) -> str:
+    """'error' when a tool reported a failure instead of raising, otherwise 'finished'"""
+    if getattr(output, "status", None) == "error":
+        return "error"
+    content = getattr(output, "content", output)
+    if isinstance(content, dict):
+        return "finished" if content.get("success", True) else "error"
+    if str(content).lstrip("❌ ").startswith(("Error", "System Error", "Search failed")):
+        return "error"
+    return "finished"
+
+async def chat_stream(user_input: str, thread_id: str, file_url: str = "", type: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams a chat turn as it happens.
+    Yields events for routing decisions, tool start/end and LLM tokens,
+    then a final event with the response and the state delta.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    input_payload = build_input_payload(user_input, file_url, type)
+
+    # Snapshot the state so we can send back only what this turn changed
+    before = (await app.aget_state(config)).values or {}
+
+    async for event in app.astream_events(input_payload, config=config, version="v2"):
+        kind = event["event"]
+        name = event.get("name")
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chain_end" and name == "orchestrator" and node == "orchestrator":
+            output = event["data"].get("output")
+            if isinstance(output, dict) and output.get("agent"):
+                yield {"event": "classification", "data": {"agent": output["agent"]}}
+
+        elif kind == "on_chain_start" and name in AGENT_NODES and node == name:
+            yield {"event": "route", "data": {"agent": name}}
+
+        # Tool arguments and results (registry records, extracted ID details, internal
+        # errors) stay on the server; the client only learns which tool ran and how it went
+        elif kind == "on_tool_start":
+            yield {"event": "tool_start", "data": {"name": name, "status": "started"}}
+
+        elif kind == "on_tool_end":
+            yield {"event": "tool_end", "data": {"name": name, "status": tool_status(event["data"].get("output"))}}
+
+        elif kind == "on_tool_error":
+            yield {"event": "tool_end", "data": {"name": name, "status": "error"}}
+
+        # Only the agents' answer models speak to the student; classifier, summary and
+        # in-tool LLM calls (e.g. ID extraction JSON) are internal
+        elif kind == "on_chat_model_stream" and RESPONSE_TAG in event.get("tags", []):
+            chunk = event["data"]["chunk"]
+            if chunk.content:
+                yield {"event": "token", "data": {"content": chunk.content}}
+
+    after = (await app.aget_state(config)).values or {}
+    delta = state_delta(before, after)
+    await compact_thread(thread_id)
+    last_message = after["messages"][-1] if after.get("messages") else None
+
+    yield {
+        "event": "final",
+        "data": {
+            "response": getattr(last_message, "content", ""),
+            "state": delta
+        }
+    }
@@ -0,0 +1,28 @@
+# database/ledger.py
+from typing import Dict, List, Optional
+from utils.supabase_client import db_call_sync
+
+# Apply database/student_ledger.sql before using these helpers
+
+def apply_payment(student_id: str, stripe_session_id: str, amount: float) -> float:
+    """Marks a checkout session paid and returns the student's new balance (one atomic RPC)"""
+    res = db_call_sync("rpc.apply_payment", lambda db: db.rpc("apply_payment", {
+        "p_student_id": student_id,
+        "p_stripe_session_id": stripe_session_id,
+        "p_amount": amount
+    }).execute())
+    return float(res.data)
+
+def get_ledger(student_id: str) -> Optional[dict]:
+    """Balance, due date and last payment for a student in a single lookup"""
+    res = db_call_sync("student_ledger.get", lambda db: db.table("student_ledger") \
+        .select("balance, next_payment_due, last_payment_amount, last_payment_at") \
+        .eq("student_id", student_id) \
+        .limit(1) \
+        .execute())
+    return res.data[0] if res.data else None
+
+def apply_payments(payments: List[dict]) -> Dict[str, float]:
+    """Applies a batch of {student_id, stripe_session_id, amount} in one RPC. Returns balance per session."""
+    res = db_call_sync("rpc.apply_payments", lambda db: db.rpc("apply_payments", {"p_payments": payments}).execute())
+    return {row["stripe_session_id"]: float(row["balance"]) for row in res.data or []}
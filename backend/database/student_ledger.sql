@@ -0,0 +1,119 @@
+-- Per-student running balance, updated in place as Stripe payments arrive.
+-- Run once in the Supabase SQL editor.
+
+create table if not exists student_ledger (
+    student_id          text primary key,
+    total_fees          numeric(12, 2) not null,
+    total_paid          numeric(12, 2) not null default 0,
+    balance             numeric(12, 2) generated always as (total_fees - total_paid) stored,
+    next_payment_due    date,
+    last_payment_amount numeric(12, 2),
+    last_payment_at     timestamptz,
+    updated_at          timestamptz not null default now()
+);
+
+-- Applies one completed checkout: marks the payment paid and moves the balance,
+-- in a single transaction. Row locks serialize concurrent payments for the same
+-- student, and a session that is already 'paid' is never counted twice.
+-- A session with no payments row raises, so the webhook queue retries it later
+-- instead of crediting money we cannot trace.
+create or replace function apply_payment(p_student_id text, p_stripe_session_id text, p_amount numeric)
+returns numeric
+language plpgsql
+as $$
+declare
+    v_status  text;
+    v_balance numeric;
+    v_fees    numeric;
+    v_due     date;
+begin
+    select status into v_status
+    from payments
+    where stripe_session_id = p_stripe_session_id
+    for update;
+
+    if not found then
+        raise exception 'No payment recorded for Stripe session %', p_stripe_session_id
+            using errcode = 'no_data_found';
+    end if;
+
+    -- Seed the ledger from the registry the first time we see this student.
+    -- Payments made before the ledger existed are folded into the opening total.
+    insert into student_ledger (student_id, total_fees, total_paid, next_payment_due)
+    select p_student_id,
+           coalesce((select s.total_fees from students s where s.student_id = p_student_id), 16000.00),
+           coalesce((select sum(p.amount) from payments p
+                     where p.student_id = p_student_id and p.status = 'paid'), 0),
+           (select s.next_payment_due from students s where s.student_id = p_student_id)
+    on conflict (student_id) do nothing;
+
+    if v_status = 'paid' then
+        select balance into v_balance from student_ledger where student_id = p_student_id;
+        return v_balance;
+    end if;
+
+    -- Fees and due dates are maintained on students; pick up any change with each payment
+    select s.total_fees, s.next_payment_due into v_fees, v_due
+    from students s
+    where s.student_id = p_student_id;
+
+    update student_ledger
+    set total_paid          = total_paid + p_amount,
+        total_fees          = coalesce(v_fees, total_fees),
+        next_payment_due    = coalesce(v_due, next_payment_due),
+        last_payment_amount = p_amount,
+        last_payment_at     = now(),
+        updated_at          = now()
+    where student_id = p_student_id
+    returning balance into v_balance;
+
+    update payments
+    set status = 'paid',
+        balance_after = v_balance
+    where stripe_session_id = p_stripe_session_id;
+
+    return v_balance;
+end;
+$$;
+
+-- Applies several checkouts in one round trip.
+-- p_payments: [{"student_id": "...", "stripe_session_id": "...", "amount": 50.0}, ...]
+create or replace function apply_payments(p_payments jsonb)
+returns table (stripe_session_id text, balance numeric)
+language plpgsql
+as $$
+declare
+    v_payment jsonb;
+begin
+    for v_payment in select * from jsonb_array_elements(p_payments)
+    loop
+        stripe_session_id := v_payment ->> 'stripe_session_id';
+        balance := apply_payment(
+            v_payment ->> 'student_id',
+            v_payment ->> 'stripe_session_id',
+            (v_payment ->> 'amount')::numeric
+        );
+        return next;
+    end loop;
+end;
+$$;
+
+-- Backfill: opens a ledger row for every student, counting the payments already
+-- marked paid. Safe to re-run: existing rows only get their fees and due date refreshed,
+-- since apply_payment keeps total_paid up to date from then on.
+insert into student_ledger (student_id, total_fees, total_paid, next_payment_due)
+select s.student_id,
+       coalesce(s.total_fees, 16000.00),
+       coalesce(paid.total, 0),
+       s.next_payment_due
+from students s
+left join (
+    select student_id, sum(amount) as total
+    from payments
+    where status = 'paid'
+    group by student_id
+) paid on paid.student_id = s.student_id
+on conflict (student_id) do update
+set total_fees       = excluded.total_fees,
+    next_payment_due = excluded.next_payment_due,
+    updated_at       = now();
@@ -0,0 +1,183 @@
+import os
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from utils.supabase_client import db_call_sync
+
+# How often rows changed in Supabase are pulled into the local copy
+STUDENT_REGISTRY_SYNC_SECONDS = int(os.getenv("STUDENT_REGISTRY_SYNC_SECONDS", "30"))
+# A full reload also picks up deleted students, which incremental sync can't see
+STUDENT_REGISTRY_RELOAD_SECONDS = int(os.getenv("STUDENT_REGISTRY_RELOAD_SECONDS", str(6 * 3600)))
+# Without updated_at (or while the table is empty) only full reloads work; this is how often they run
+STUDENT_REGISTRY_FALLBACK_RELOAD_SECONDS = int(os.getenv("STUDENT_REGISTRY_FALLBACK_RELOAD_SECONDS", "900"))
+# Incremental syncs re-read this much before the last updated_at seen, so rows committed
+# late with an earlier timestamp (or sharing the boundary timestamp) are not skipped
+SYNC_OVERLAP_SECONDS = 5
+# Lookups that found nobody are remembered this long before asking Supabase again
+NOT_FOUND_TTL_SECONDS = 60
+PAGE_SIZE = 1000
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+class StudentRegistry:
+    """
+    In-process copy of the students table, indexed by student_id and by normalized
+    email. Loaded from a full snapshot, kept fresh by pulling rows whose updated_at
+    moved, and falling back to Supabase for anyone not yet replicated.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_email: Dict[str, Dict[str, Any]] = {}
+        self.synced_until: Optional[str] = None   # highest updated_at seen
+        self.loaded_at = 0.0
+        self.stats = {"hits": 0, "read_through": 0, "not_found": 0, "synced_rows": 0}
+        self._not_found: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # Without an updated_at column we can only reload everything
+        self._incremental = True
+
+    def _index(self, student: Dict[str, Any]):
+        old = self.by_id.get(student["student_id"])
+        if old is not None:
+            self.by_email.pop(normalize_email(old.get("email")), None)
+        self.by_id[student["student_id"]] = student
+        if student.get("email"):
+            self.by_email[normalize_email(student["email"])] = student
+        self._not_found.pop(f"id:{student['student_id']}", None)
+        self._not_found.pop(f"email:{normalize_email(student.get('email'))}", None)
+        updated_at = student.get("updated_at")
+        if updated_at and (self.synced_until is None or updated_at > self.synced_until):
+            self.synced_until = updated_at
+
+    def _fetch_pages(self, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Pages are cut by offset, so every query needs a total order or rows slip between pages
+        def fetch_page(db, start: int):
+            query = db.table("students").select("*")
+            if since is not None:
+                query = query.gt("updated_at", since).order("updated_at").order("student_id")
+            else:
+                query = query.order("student_id")
+            return query.range(start, start + PAGE_SIZE - 1).execute()
+
+        rows, start = [], 0
+        while True:
+            page = db_call_sync("students.sync", lambda db: fetch_page(db, start)).data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+
+    def load(self):
+        """Replaces the local copy with a full snapshot of the students table"""
+        with self._sync_lock:
+            rows = self._fetch_pages()
+            with self._lock:
+                self.by_id, self.by_email, self.synced_until = {}, {}, None
+                self._not_found.clear()
+                for row in rows:
+                    self._index(row)
+                self.loaded_at = time.time()
+            self._incremental = bool(rows) and "updated_at" in rows[0]
+            print(f"🎓 Student registry loaded: {len(rows)} students")
+
+    def _sync_since(self) -> Optional[str]:
+        if self.synced_until is None:
+            return None
+        try:
+            moment = datetime.fromisoformat(self.synced_until.replace("Z", "+00:00"))
+        except ValueError:
+            return self.synced_until
+        return (moment - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+
+    def sync(self) -> int:
+        """Pulls students changed since the last sync. Returns rows that changed."""
+        age = time.time() - self.loaded_at
+        if not self.loaded_at or age > STUDENT_REGISTRY_RELOAD_SECONDS:
+            self.load()
+            return len(self.by_id)
+        if not self._incremental:
+            # Nothing to sync incrementally from; reads fall through to Supabase meanwhile
+            if age > STUDENT_REGISTRY_FALLBACK_RELOAD_SECONDS:
+                self.load()
+                return len(self.by_id)
+            return 0
+        with self._sync_lock:
+            rows = self._fetch_pages(since=self._sync_since())
+            with self._lock:
+                # The overlap window brings back rows we already hold; only count real changes
+                changed = [row for row in rows if self.by_id.get(row["student_id"]) != row]
+                for row in changed:
+                    self._index(row)
+                self.stats["synced_rows"] += len(changed)
+            return len(changed)
+
+    def _read_through(self, key: str, column: str, value: str, exact: bool) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            expires_at = self._not_found.get(key)
+            if expires_at and expires_at > time.time():
+                self.stats["not_found"] += 1
+                return None
+        def fetch(db):
+            query = db.table("students").select("*")
+            query = query.eq(column, value) if exact else query.ilike(column, value)
+            return query.limit(1).execute()
+
+        response = db_call_sync(f"students.by_{column}", fetch)
+        with self._lock:
+            if response.data:
+                self.stats["read_through"] += 1
+                self._index(response.data[0])
+                return response.data[0]
+            self._not_found[key] = time.time() + NOT_FOUND_TTL_SECONDS
+            self.stats["not_found"] += 1
+            return None
+
+    def get_by_id(self, student_id: str) -> Optional[Dict[str, Any]]:
+        student_id = (student_id or "").strip()
+        with self._lock:
+            student = self.by_id.get(student_id)
+            if student is not None:
+                self.stats["hits"] += 1
+                return student
+        return self._read_through(f"id:{student_id}", "student_id", student_id, exact=True)
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        email = normalize_email(email)
+        with self._lock:
+            student = self.by_email.get(email)
+            if student is not None:
+                self.stats["hits"] += 1
+                return student
+        return self._read_through(f"email:{email}", "email", email, exact=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["read_through"] + self.stats["not_found"]
+            return {
+                **self.stats,
+                "students": len(self.by_id),
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "synced_until": self.synced_until,
+                "incremental": self._incremental,
+            }
+
+
+# Shared instance used by the student lookup tools
+student_registry = StudentRegistry()
+
+
+async def sync_forever():
+    """Background job: loads the registry, then pulls changes every STUDENT_REGISTRY_SYNC_SECONDS"""
+    while True:
+        try:
+            await asyncio.to_thread(student_registry.sync)
+        except Exception as e:
+            print(f"Student registry sync failed: {e}")
+        await asyncio.sleep(STUDENT_REGISTRY_SYNC_SECONDS)
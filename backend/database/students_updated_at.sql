@@ -0,0 +1,21 @@
+-- Lets the in-process student registry pull only rows changed since its last sync.
+-- Run once in the Supabase SQL editor.
+
+alter table students add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists students_updated_at_idx on students (updated_at);
+
+create or replace function touch_students_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists students_touch_updated_at on students;
+create trigger students_touch_updated_at
+    before update on students
+    for each row execute function touch_students_updated_at();
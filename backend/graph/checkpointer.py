@@ -0,0 +1,135 @@
+# graph/checkpointer.py
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+from langgraph.checkpoint.memory import MemorySaver
+from graph import compaction
+from graph.compaction import BlobOffloadSerializer
+
+load_dotenv()
+
+# memory   -> in-process only (lost on restart, single worker)
+# sqlite   -> durable, single node (several workers can share the file)
+# postgres -> durable, shared across nodes
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite").lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+CHECKPOINT_POSTGRES_URL = os.getenv("CHECKPOINT_POSTGRES_URL")
+CHECKPOINT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", "10"))
+# How often idle threads and unused blobs are swept
+CHECKPOINT_SWEEP_INTERVAL = int(os.getenv("CHECKPOINT_SWEEP_INTERVAL_SECONDS", "600"))
+# A thread is pruned at most this often; turns in between only add a few checkpoints
+CHECKPOINT_COMPACT_INTERVAL = int(os.getenv("CHECKPOINT_COMPACT_INTERVAL_SECONDS", "120"))
+
+# One checkpointer per process, shared by the graph and the app lifecycle hooks
+_checkpointer = None
+_pool = None
+_sweeper = None
+_last_compacted = {}
+
+def get_checkpointer():
+    """Returns the process-wide checkpointer for the configured backend"""
+    global _checkpointer, _pool
+    if _checkpointer is not None:
+        return _checkpointer
+
+    if CHECKPOINT_BACKEND == "sqlite":
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        # The connection is opened lazily on first use inside the event loop
+        conn = aiosqlite.connect(CHECKPOINT_SQLITE_PATH, check_same_thread=False)
+        _checkpointer = AsyncSqliteSaver(conn, serde=BlobOffloadSerializer())
+
+    elif CHECKPOINT_BACKEND == "postgres":
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+        if not CHECKPOINT_POSTGRES_URL:
+            raise ValueError("CHECKPOINT_POSTGRES_URL must be set when CHECKPOINT_BACKEND=postgres")
+
+        # The pool is opened in open_checkpointer() once the event loop is running
+        _pool = AsyncConnectionPool(
+            conninfo=CHECKPOINT_POSTGRES_URL,
+            max_size=CHECKPOINT_POOL_SIZE,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            open=False
+        )
+        _checkpointer = AsyncPostgresSaver(_pool, serde=BlobOffloadSerializer())
+
+    elif CHECKPOINT_BACKEND == "memory":
+        _checkpointer = MemorySaver(serde=BlobOffloadSerializer())
+
+    else:
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND: {CHECKPOINT_BACKEND}")
+
+    print(f"💾 Checkpointer: {CHECKPOINT_BACKEND}")
+    return _checkpointer
+
+async def open_checkpointer():
+    """Opens connections and creates the checkpoint tables. Call on app startup."""
+    global _sweeper
+    checkpointer = get_checkpointer()
+
+    if CHECKPOINT_BACKEND == "sqlite":
+        await checkpointer.setup()
+        # WAL lets several uvicorn workers read while one writes
+        await checkpointer.conn.execute("PRAGMA journal_mode=WAL")
+    elif CHECKPOINT_BACKEND == "postgres":
+        await _pool.open()
+        await checkpointer.setup()
+
+    _sweeper = asyncio.create_task(_sweep_forever())
+
+async def close_checkpointer():
+    """Releases checkpoint connections. Call on app shutdown."""
+    if _sweeper is not None:
+        _sweeper.cancel()
+
+    if CHECKPOINT_BACKEND == "sqlite" and _checkpointer is not None:
+        await _checkpointer.conn.close()
+    elif CHECKPOINT_BACKEND == "postgres" and _pool is not None:
+        await _pool.close()
+
+async def compact_thread(thread_id: str):
+    """Drops superseded checkpoints for a thread. Call once a turn has finished."""
+    now = time.monotonic()
+    if now - _last_compacted.get(thread_id, float("-inf")) < CHECKPOINT_COMPACT_INTERVAL:
+        return
+    if len(_last_compacted) > 10000:
+        # Forget threads whose throttle window has passed anyway
+        for stale in [t for t, at in _last_compacted.items() if now - at >= CHECKPOINT_COMPACT_INTERVAL]:
+            del _last_compacted[stale]
+    _last_compacted[thread_id] = now
+    try:
+        await compaction.prune_thread(CHECKPOINT_BACKEND, get_checkpointer(), _pool, thread_id)
+    except Exception as e:
+        # Compaction is best effort, never fail the chat turn because of it
+        print(f"Checkpoint compaction failed for {thread_id}: {e}")
+
+async def sweep_checkpoints():
+    """Evicts idle threads and blobs nothing has referenced within the TTL"""
+    evicted = await compaction.evict_idle_threads(CHECKPOINT_BACKEND, get_checkpointer(), _pool)
+    blobs_removed = await asyncio.to_thread(compaction.sweep_blobs)
+    return {"threads_evicted": len(evicted), "blobs_removed": blobs_removed}
+
+async def _sweep_forever():
+    while True:
+        await asyncio.sleep(CHECKPOINT_SWEEP_INTERVAL)
+        try:
+            await sweep_checkpoints()
+        except Exception as e:
+            print(f"Checkpoint sweep failed: {e}")
+
+async def get_checkpoint_stats():
+    """Bytes and checkpoints stored per thread, reported by /stats/checkpoints"""
+    sizes = await compaction.thread_sizes(CHECKPOINT_BACKEND, get_checkpointer(), _pool)
+    return {
+        "backend": CHECKPOINT_BACKEND,
+        "keep_depth": compaction.CHECKPOINT_KEEP_DEPTH,
+        "thread_ttl_seconds": compaction.CHECKPOINT_THREAD_TTL,
+        "threads": sizes,
+        "total_bytes": sum(s["bytes"] for s in sizes.values()),
+        "blob_store_bytes": await asyncio.to_thread(compaction.blob_store_bytes),
+    }
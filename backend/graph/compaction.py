@@ -0,0 +1,367 @@
+# graph/compaction.py
+import os
+import time
+import uuid
+import hashlib
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How many root checkpoints to keep per thread. Older steps (and the subgraph
+# checkpoints written before them) are deleted once a turn has finished.
+CHECKPOINT_KEEP_DEPTH = max(1, int(os.getenv("CHECKPOINT_KEEP_DEPTH", "3")))
+# Threads with no new checkpoint for this long are deleted entirely
+CHECKPOINT_THREAD_TTL = int(os.getenv("CHECKPOINT_THREAD_TTL_SECONDS", str(24 * 3600)))
+# Binary values at least this big are written to the blob store, not the checkpoint
+CHECKPOINT_BLOB_MIN_BYTES = int(os.getenv("CHECKPOINT_BLOB_MIN_BYTES", "1024"))
+# Content-addressed blob store. Point this at a shared mount when running several nodes.
+CHECKPOINT_BLOB_DIR = os.getenv("CHECKPOINT_BLOB_DIR", "checkpoint_blobs")
+
+# Marker left in the checkpoint where a blob used to be
+BLOB_REF_PREFIX = "\x00blob:sha256:"
+
+# Offset between the UUID epoch (1582-10-15) and the unix epoch, in 100ns ticks
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(CHECKPOINT_BLOB_DIR, digest[:2], digest)
+
+
+def put_blob(data: bytes) -> str:
+    """Stores bytes under their sha256 and returns the reference string"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        # Refresh mtime so the blob sweep knows it is still in use
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return BLOB_REF_PREFIX + digest
+
+
+def get_blob(ref: str) -> bytes:
+    digest = ref[len(BLOB_REF_PREFIX):]
+    path = _blob_path(digest)
+    with open(path, "rb") as f:
+        data = f.read()
+    # Reading counts as use too: a blob written once by a long-lived thread must survive the sweep
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def _offload(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)) and len(value) >= CHECKPOINT_BLOB_MIN_BYTES:
+        return put_blob(bytes(value))
+    if isinstance(value, dict):
+        return {k: _offload(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_offload(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_offload(v) for v in value)
+    return value
+
+
+def _restore(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith(BLOB_REF_PREFIX):
+        try:
+            return get_blob(value)
+        except OSError as e:
+            print(f"Could not load checkpoint blob {value[len(BLOB_REF_PREFIX):][:12]}: {e}")
+            return None
+    if isinstance(value, dict):
+        return {k: _restore(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_restore(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_restore(v) for v in value)
+    return value
+
+
+class BlobOffloadSerializer:
+    """
+    Wraps the checkpointer's serializer so large binary values (e.g. image_bytes)
+    are stored once by content hash instead of being copied into every checkpoint.
+    """
+
+    def __init__(self, inner=None):
+        if inner is None:
+            from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+            inner = JsonPlusSerializer()
+        self.inner = inner
+
+    def dumps_typed(self, obj: Any):
+        return self.inner.dumps_typed(_offload(obj))
+
+    def loads_typed(self, data):
+        return _restore(self.inner.loads_typed(data))
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.inner.dumps(_offload(obj))
+
+    def loads(self, data: bytes) -> Any:
+        return _restore(self.inner.loads(data))
+
+
+def checkpoint_id_time(checkpoint_id: str) -> float:
+    """Unix time encoded in a langgraph (uuid6) checkpoint id"""
+    value = uuid.UUID(checkpoint_id).int
+    ticks = ((value >> 80) << 12) | ((value >> 64) & 0x0FFF)
+    return (ticks - _UUID_EPOCH_OFFSET) / 1e7
+
+
+# --- Pruning superseded steps -------------------------------------------------
+
+async def prune_thread(backend: str, checkpointer, pool, thread_id: str) -> int:
+    """Deletes checkpoints older than the last CHECKPOINT_KEEP_DEPTH root steps. Returns rows removed."""
+    if backend == "sqlite":
+        return await _prune_sqlite(checkpointer, thread_id)
+    if backend == "postgres":
+        return await _prune_postgres(pool, thread_id)
+    if backend == "memory":
+        return _prune_memory(checkpointer, thread_id)
+    return 0
+
+
+async def _prune_sqlite(checkpointer, thread_id: str) -> int:
+    async with checkpointer.lock:
+        async with checkpointer.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, CHECKPOINT_KEEP_DEPTH - 1),
+        ) as cur:
+            row = await cur.fetchone()
+        if not row:
+            return 0
+        cutoff = row[0]
+
+        # Checkpoint ids are time ordered, so this also drops subgraph
+        # namespaces left behind by earlier turns
+        cur = await checkpointer.conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < ?",
+            (thread_id, cutoff),
+        )
+        removed = cur.rowcount
+        await checkpointer.conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < ?",
+            (thread_id, cutoff),
+        )
+        await checkpointer.conn.commit()
+        return removed
+
+
+async def _prune_postgres(pool, thread_id: str) -> int:
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = %s AND checkpoint_ns = '' "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET %s",
+                (thread_id, CHECKPOINT_KEEP_DEPTH - 1),
+            )
+            row = await cur.fetchone()
+            if not row:
+                return 0
+            cutoff = row["checkpoint_id"]
+
+            await cur.execute(
+                "DELETE FROM checkpoints WHERE thread_id = %s AND checkpoint_id < %s",
+                (thread_id, cutoff),
+            )
+            removed = cur.rowcount
+            await cur.execute(
+                "DELETE FROM checkpoint_writes WHERE thread_id = %s AND checkpoint_id < %s",
+                (thread_id, cutoff),
+            )
+            # Channel values live in their own table, one row per version.
+            # Drop the versions no remaining checkpoint points at.
+            await cur.execute(
+                """
+                DELETE FROM checkpoint_blobs b
+                WHERE b.thread_id = %s
+                  AND NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = b.thread_id
+                      AND c.checkpoint_ns = b.checkpoint_ns
+                      AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+                  )
+                """,
+                (thread_id,),
+            )
+            return removed
+
+
+def _prune_memory(checkpointer, thread_id: str) -> int:
+    namespaces = checkpointer.storage.get(thread_id)
+    if not namespaces or "" not in namespaces:
+        return 0
+    root_ids = sorted(namespaces[""], reverse=True)
+    if len(root_ids) <= CHECKPOINT_KEEP_DEPTH:
+        return 0
+    cutoff = root_ids[CHECKPOINT_KEEP_DEPTH - 1]
+
+    removed = 0
+    live_versions = set()
+    for ns, checkpoints in namespaces.items():
+        for checkpoint_id in [c for c in checkpoints if c < cutoff]:
+            del checkpoints[checkpoint_id]
+            checkpointer.writes.pop((thread_id, ns, checkpoint_id), None)
+            removed += 1
+        for saved, _, _ in checkpoints.values():
+            checkpoint = checkpointer.serde.loads_typed(saved)
+            for channel, version in checkpoint.get("channel_versions", {}).items():
+                live_versions.add((ns, channel, version))
+
+    for key in [k for k in checkpointer.blobs if k[0] == thread_id and k[1:] not in live_versions]:
+        del checkpointer.blobs[key]
+    return removed
+
+
+# --- Idle thread eviction -----------------------------------------------------
+
+async def _latest_checkpoint_ids(backend: str, checkpointer, pool) -> Dict[str, str]:
+    """Newest root checkpoint id per thread"""
+    if backend == "sqlite":
+        async with checkpointer.lock:
+            async with checkpointer.conn.execute(
+                "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints "
+                "WHERE checkpoint_ns = '' GROUP BY thread_id"
+            ) as cur:
+                return {row[0]: row[1] for row in await cur.fetchall()}
+    if backend == "postgres":
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "SELECT thread_id, MAX(checkpoint_id) AS checkpoint_id FROM checkpoints "
+                    "WHERE checkpoint_ns = '' GROUP BY thread_id"
+                )
+                return {row["thread_id"]: row["checkpoint_id"] for row in await cur.fetchall()}
+    if backend == "memory":
+        return {
+            thread_id: max(namespaces[""])
+            for thread_id, namespaces in checkpointer.storage.items()
+            if namespaces.get("")
+        }
+    return {}
+
+
+async def evict_idle_threads(backend: str, checkpointer, pool) -> List[str]:
+    """Deletes every thread whose last checkpoint is older than CHECKPOINT_THREAD_TTL"""
+    cutoff = time.time() - CHECKPOINT_THREAD_TTL
+    latest = await _latest_checkpoint_ids(backend, checkpointer, pool)
+
+    evicted = []
+    for thread_id, checkpoint_id in latest.items():
+        if checkpoint_id_time(checkpoint_id) < cutoff:
+            await checkpointer.adelete_thread(thread_id)
+            evicted.append(thread_id)
+
+    if evicted:
+        print(f"🧹 Evicted {len(evicted)} idle thread(s) from the checkpointer")
+    return evicted
+
+
+def sweep_blobs() -> int:
+    """
+    Removes blob files no checkpoint has written or read for longer than the thread TTL.
+    Any thread that could still reference such a blob has been idle that long and is evicted.
+    """
+    if not os.path.isdir(CHECKPOINT_BLOB_DIR):
+        return 0
+    cutoff = time.time() - CHECKPOINT_THREAD_TTL
+    removed = 0
+    for root, _, files in os.walk(CHECKPOINT_BLOB_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
+
+
+# --- Stats --------------------------------------------------------------------
+
+async def thread_sizes(backend: str, checkpointer, pool) -> Dict[str, Dict[str, int]]:
+    """Checkpoint count and stored bytes per thread"""
+    if backend == "sqlite":
+        return await _sizes_sqlite(checkpointer)
+    if backend == "postgres":
+        return await _sizes_postgres(pool)
+    if backend == "memory":
+        return _sizes_memory(checkpointer)
+    return {}
+
+
+async def _sizes_sqlite(checkpointer) -> Dict[str, Dict[str, int]]:
+    sizes: Dict[str, Dict[str, int]] = {}
+    async with checkpointer.lock:
+        async with checkpointer.conn.execute(
+            "SELECT thread_id, COUNT(*), SUM(LENGTH(checkpoint) + LENGTH(metadata)) "
+            "FROM checkpoints GROUP BY thread_id"
+        ) as cur:
+            for thread_id, count, size in await cur.fetchall():
+                sizes[thread_id] = {"checkpoints": count, "bytes": size or 0}
+        async with checkpointer.conn.execute(
+            "SELECT thread_id, SUM(LENGTH(value)) FROM writes GROUP BY thread_id"
+        ) as cur:
+            for thread_id, size in await cur.fetchall():
+                sizes.setdefault(thread_id, {"checkpoints": 0, "bytes": 0})["bytes"] += size or 0
+    return sizes
+
+
+async def _sizes_postgres(pool) -> Dict[str, Dict[str, int]]:
+    sizes: Dict[str, Dict[str, int]] = {}
+    queries = [
+        ("SELECT thread_id, COUNT(*) AS n, SUM(pg_column_size(checkpoint) + pg_column_size(metadata)) AS size "
+         "FROM checkpoints GROUP BY thread_id", True),
+        ("SELECT thread_id, 0 AS n, SUM(octet_length(blob)) AS size FROM checkpoint_blobs GROUP BY thread_id", False),
+        ("SELECT thread_id, 0 AS n, SUM(octet_length(blob)) AS size FROM checkpoint_writes GROUP BY thread_id", False),
+    ]
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            for query, counts_checkpoints in queries:
+                await cur.execute(query)
+                for row in await cur.fetchall():
+                    entry = sizes.setdefault(row["thread_id"], {"checkpoints": 0, "bytes": 0})
+                    entry["bytes"] += int(row["size"] or 0)
+                    if counts_checkpoints:
+                        entry["checkpoints"] = row["n"]
+    return sizes
+
+
+def _sizes_memory(checkpointer) -> Dict[str, Dict[str, int]]:
+    sizes: Dict[str, Dict[str, int]] = {}
+    for thread_id, namespaces in checkpointer.storage.items():
+        entry = sizes.setdefault(thread_id, {"checkpoints": 0, "bytes": 0})
+        for checkpoints in namespaces.values():
+            for saved, metadata, _ in checkpoints.values():
+                entry["checkpoints"] += 1
+                entry["bytes"] += len(saved[1]) + len(metadata[1])
+    for (thread_id, *_), (_, blob) in checkpointer.blobs.items():
+        sizes.setdefault(thread_id, {"checkpoints": 0, "bytes": 0})["bytes"] += len(blob)
+    for (thread_id, *_), writes in checkpointer.writes.items():
+        entry = sizes.setdefault(thread_id, {"checkpoints": 0, "bytes": 0})
+        for write in writes.values():
+            entry["bytes"] += len(write[2][1])
+    return sizes
+
+
+def blob_store_bytes() -> int:
+    total = 0
+    for root, _, files in os.walk(CHECKPOINT_BLOB_DIR):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
@@ -39,3 +39,7 @@ class UniversityState(TypedDict, total=False):
     
     # Routing
     agent: Optional[str]
+
+
+# Tag on each agent's answer model; only tokens from runs carrying it are streamed to the student
+RESPONSE_TAG = "agent_response"
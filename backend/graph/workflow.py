@@ -1,11 +1,11 @@
 # graph/workflow.py
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from graph.checkpointer import get_checkpointer
 from graph.state import UniversityState
 from agents.payment_agent import payment_agent
 # from agents.reconciliation_agent import reconciliation_agent
 from agents.info_agent import info_agent
-from agents.orchestrator import orchestrator, router
+from agents.orchestrator import orchestrator, router, pre_router
 from agents.appointment_agent import appointment_app
 
 def build_graph():
@@ -21,7 +21,15 @@ def build_graph():
     workflow.add_node("appointment_agent", appointment_app)
     
     # Set entry point
-    workflow.set_entry_point("orchestrator")
+    # Sticky context is checked first; the orchestrator only runs when it's needed
+    workflow.set_conditional_entry_point(
+        pre_router,
+        {
+            "orchestrator": "orchestrator",
+            "payment_agent": "payment_agent",
+            "appointment_agent": "appointment_agent",
+        }
+    )
     
     # Orchestrator routes to agents
     workflow.add_conditional_edges(
@@ -42,6 +50,7 @@ def build_graph():
     workflow.add_edge("info_agent", END)
     workflow.add_edge("appointment_agent", END)
     
-    memory = MemorySaver()
+    # Durable checkpointer (sqlite/postgres) so threads survive restarts and workers
+    memory = get_checkpointer()
     # Compile and return
     return workflow.compile(checkpointer=memory)
\ No newline at end of file
@@ -1,19 +1,67 @@
 import uuid  # <--- IMPORT THIS
-from utils.supabase_client import supabase
+import json
+import asyncio
+from utils.supabase_client import open_supabase, close_supabase, get_db_stats
 from typing import Optional
-from fastapi import FastAPI, Form, File, UploadFile
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Form, File, UploadFile, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage
-from utils.upload_to_supabase import upload_file_to_supabase
-from chat import chat 
+from utils.upload_to_supabase import upload_file_to_supabase, UploadTooLargeError, UPLOAD_MAX_BYTES
+from utils.body_limit import RequestSizeLimitMiddleware
+from chat import chat, chat_stream
+from graph.checkpointer import open_checkpointer, close_checkpointer, get_checkpoint_stats
+from agents.orchestrator import get_routing_stats
+from utils.tool_executor import shutdown_tool_pools
+from services.vision.worker_pool import vision_pool
+from utils.search_cache import search_cache
+from utils.semantic_cache import answer_cache
+from utils.image_cache import image_cache
+from utils.upload_index import upload_index
+from services.info.knowledge_index import refresh_forever
+from database.student_registry import student_registry, sync_forever
+from services.payments.webhook_queue import webhook_queue, enqueue_event, start_webhook_workers, stop_webhook_workers
 import stripe
 from fastapi import Request, HTTPException
 import os
+import secrets
 from dotenv import load_dotenv
 
 load_dotenv() 
 
-app = FastAPI()
+# Shared secret for maintenance endpoints (X-Admin-Token header). Unset disables them.
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared async Supabase client used by tools, uploads and the webhook workers
+    await open_supabase()
+    # Open the shared checkpoint store before serving any chat
+    await open_checkpointer()
+    # Keep the local knowledge snapshot fresh in the background
+    knowledge_refresher = asyncio.create_task(refresh_forever())
+    # Replicate the students table locally and keep it in sync
+    registry_syncer = asyncio.create_task(sync_forever())
+    # Apply queued Stripe events in the background
+    start_webhook_workers()
+    # Spawn the OCR / face workers now so their models are loaded before the first upload
+    vision_pool.start()
+    yield
+    stop_webhook_workers()
+    registry_syncer.cancel()
+    knowledge_refresher.cancel()
+    await close_checkpointer()
+    shutdown_tool_pools()
+    vision_pool.shutdown()
+    await close_supabase()
+
+app = FastAPI(lifespan=lifespan)
+
+# Cap whole request bodies (the upload plus the other form fields) before they are parsed.
+# Added before CORS so its 413 responses still carry the CORS headers.
+REQUEST_MAX_BYTES = UPLOAD_MAX_BYTES + 1024 * 1024
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=REQUEST_MAX_BYTES)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,8 +104,11 @@ async def chat_endpoint(
     file_url = None
     if file:
         try:
-            file_url = await upload_file_to_supabase(file)
+            # ID cards re-uploaded in this conversation reuse the earlier stored object
+            file_url = await upload_file_to_supabase(file, dedupe=(type == "id_card"), owner=thread_id)
             print(f"✅ File uploaded: {file_url}")
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             return {"response": f"Error uploading file: {str(e)}", "state": {}}
 
@@ -83,6 +134,154 @@ async def chat_endpoint(
         "state": {**updated_state, "messages": serialized_messages}
     }
 
+def sse_event(event: str, data) -> str:
+    """Formats one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    user_input: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    thread_id: Optional[str] = Form(None),
+    type: Optional[str] = Form(None)
+):
+    """
+    Same as /chat, but streams routing decisions, tool calls and LLM tokens
+    as Server-Sent Events while the graph runs.
+    Upload failures, including files over UPLOAD_MAX_BYTES, are sent as an `error` event.
+    Only a request body over REQUEST_MAX_BYTES is refused with a plain 413, before streaming starts.
+    """
+    if not thread_id:
+        thread_id = str(uuid.uuid4())
+        print(f"🆔 STARTING NEW SESSION: {thread_id}")
+    else:
+        print(f"🆔 RESUMING SESSION: {thread_id}")
+
+    # Upload before we start streaming; a failure is reported as an SSE error event
+    file_url = None
+    upload_error = None
+    if file:
+        try:
+            # ID cards re-uploaded in this conversation reuse the earlier stored object
+            file_url = await upload_file_to_supabase(file, dedupe=(type == "id_card"), owner=thread_id)
+            print(f"✅ File uploaded: {file_url}")
+        except Exception as e:
+            # UploadTooLargeError included: every upload failure here arrives as the same SSE error event
+            upload_error = f"Error uploading file: {str(e)}"
+
+    async def event_generator():
+        yield sse_event("session", {"thread_id": thread_id})
+        if upload_error:
+            yield sse_event("error", {"response": upload_error})
+            return
+        try:
+            async for event in chat_stream(
+                user_input=user_input,
+                thread_id=thread_id,
+                file_url=file_url,
+                type=type
+            ):
+                data = event["data"]
+                if event["event"] == "final":
+                    state = data["state"]
+                    data = {
+                        **data,
+                        "thread_id": thread_id,
+                        "state": {**state, "messages": [serialize_message(m) for m in state.get("messages", [])]}
+                    }
+                yield sse_event(event["event"], data)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield sse_event("error", {"response": f"System Error: {str(e)}"})
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/stats/routing")
+async def routing_stats_endpoint():
+    """
+    Reports how turns were routed and how many LLM classifications were avoided.
+    """
+    return get_routing_stats()
+
+@app.get("/stats/checkpoints")
+async def checkpoint_stats_endpoint():
+    """
+    Reports how many checkpoints and bytes each conversation thread is holding.
+    """
+    return await get_checkpoint_stats()
+
+@app.get("/stats/search-cache")
+async def search_cache_stats_endpoint():
+    """
+    Reports hit/miss counts for the university search cache.
+    """
+    return search_cache.get_stats()
+
+@app.get("/stats/answer-cache")
+async def answer_cache_stats_endpoint():
+    """
+    Reports hit/miss counts for the info agent's semantic answer cache.
+    """
+    return answer_cache.get_stats()
+
+@app.get("/stats/database")
+async def database_stats_endpoint():
+    """
+    Reports call counts, errors, timeouts and latency per Supabase operation.
+    """
+    return get_db_stats()
+
+@app.get("/stats/vision")
+async def vision_stats_endpoint():
+    """
+    Reports jobs submitted, completed, rejected and timed out by the vision workers.
+    """
+    return vision_pool.get_stats()
+
+@app.get("/stats/image-cache")
+async def image_cache_stats_endpoint():
+    """
+    Reports downloads, hits and memory use of the vision tools' image cache.
+    """
+    return image_cache.get_stats()
+
+@app.get("/stats/upload-dedupe")
+async def upload_dedupe_stats_endpoint():
+    """
+    Reports how many ID uploads were recognised as repeats of one already stored.
+    """
+    return upload_index.get_stats()
+
+@app.get("/stats/student-registry")
+async def student_registry_stats_endpoint():
+    """
+    Reports the size, sync position and hit rate of the local student registry.
+    """
+    return student_registry.get_stats()
+
+def require_admin(token: Optional[str]):
+    if not ADMIN_API_TOKEN or not token or not secrets.compare_digest(token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.delete("/cache/answers")
+async def invalidate_answer_cache(
+    source: Optional[str] = None,
+    question: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Drops cached info answers citing a source URL or answering an exact question (admin only).
+    """
+    require_admin(x_admin_token)
+    if not source and not question:
+        raise HTTPException(status_code=400, detail="Give a source or a question to invalidate")
+    return {"removed": answer_cache.invalidate(source=source, question=question)}
+
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 endpoint_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
 
@@ -101,45 +300,31 @@ async def stripe_webhook(request: Request):
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    # 3. Handle the 'Success' Event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        
-        # 1. EXTRACT INFO
-        student_number = session['metadata'].get('student_id')
-        amount_paid = float(session['amount_total'] / 100) # Convert pence to pounds
-        stripe_id = session['id']
-
-        print(f"💰 Webhook: Received £{amount_paid} from {student_number}")
-
-        # 2. GET TOTAL FEE FROM STUDENTS TABLE
-        # We need to know how much they were supposed to pay in total
-        student_res = supabase.table("students").select("total_fees").eq("student_id", student_number).execute()
-        
-        # Default to 16000 if not found in DB
-        total_fee = float(student_res.data[0]['total_fees']) if student_res.data else 16000.00
-
-        # 3. CALCULATE TOTAL PREVIOUSLY PAID
-        # Sum up all successful payments (excluding the current one we are processing)
-        payments_res = supabase.table("payments").select("amount") \
-            .eq("student_id", student_number) \
-            .eq("status", "paid") \
-            .neq("stripe_session_id", stripe_id) \
-            .execute()
-        
-        previous_paid = sum(record['amount'] for record in payments_res.data)
-        
-        # 4. MATH: CALCULATE NEW BALANCE
-        # Balance = Total Fee - (Previously Paid + Currently Paid)
-        new_balance = total_fee - (previous_paid + amount_paid)
-
-        # 5. UPDATE DATABASE
-        # We mark it as 'paid' AND save the 'balance_after' for record keeping
-        supabase.table("payments").update({
-            "status": "paid",
-            "balance_after": new_balance
-        }).eq("stripe_session_id", stripe_id).execute()
-        
-        print(f"✅ Balance Updated: Student now owes £{new_balance}")
-
-    return {"status": "success"}
\ No newline at end of file
+    # 3. Persist and acknowledge straight away
+    # The ledger update happens in the background webhook workers, so slow database
+    # writes never hold up Stripe's delivery or the chat endpoints.
+    # Stripe redelivers on timeouts and errors; an event id we already hold is not applied twice
+    queued = await enqueue_event(event.to_dict() if hasattr(event, "to_dict") else dict(event))
+    if not queued:
+        print(f"↩️ Duplicate webhook ignored: {event['type']} {event['id']}")
+        return {"status": "duplicate"}
+    print(f"📥 Webhook queued: {event['type']} {event['id']}")
+
+    return {"status": "success"}
+
+@app.get("/stats/webhooks")
+async def webhook_stats_endpoint():
+    """
+    Reports how many Stripe events are pending, processing, done or failed.
+    """
+    return await asyncio.to_thread(webhook_queue.counts)
+
+@app.get("/stats/webhooks/{event_id}")
+async def webhook_event_endpoint(event_id: str):
+    """
+    Shows whether a Stripe event was received and what processing it did.
+    """
+    event = await asyncio.to_thread(webhook_queue.lookup, event_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event
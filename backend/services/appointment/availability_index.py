@@ -0,0 +1,150 @@
+import os
+import time
+import threading
+from bisect import insort
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from services.appointment.google_service import get_google_service
+from utils.date_cheat_sheet import get_booking_dates
+from utils.slot_engine import date_range, free_slots_by_day
+
+CALENDAR_ID = 'primary'
+# How long the cached free/busy picture is trusted before asking Google again
+AVAILABILITY_TTL_SECONDS = int(os.getenv("AVAILABILITY_TTL_SECONDS", "60"))
+# Finance Team consultation window (UTC, matching how meetings are booked)
+FINANCE_DAY_START = "13:00"
+FINANCE_DAY_END = "16:00"
+FINANCE_WORKING_DAYS = range(5)  # Mon-Fri
+SLOT_MINUTES = 30
+# Meeting lengths the agent may ask for
+MIN_SLOT_MINUTES = 15
+MAX_SLOT_MINUTES = 240
+# Slot starts snap to this grid (13:00, 13:15, ...) so a meeting ending at :15 doesn't waste half an hour
+SLOT_STEP_MINUTES = 15
+# Gap kept clear before and after existing meetings
+SLOT_BUFFER_MINUTES = int(os.getenv("FINANCE_SLOT_BUFFER_MINUTES", "0"))
+
+Interval = Tuple[datetime, datetime]
+
+
+def parse_iso(value: str) -> datetime:
+    """Parses an RFC3339 timestamp; naive values are treated as UTC like book_meeting does"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def day_bounds(date_str: str, start: str = FINANCE_DAY_START, end: str = FINANCE_DAY_END) -> Interval:
+    return (
+        parse_iso(f"{date_str}T{start}:00Z"),
+        parse_iso(f"{date_str}T{end}:00Z"),
+    )
+
+
+class AvailabilityIndex:
+    """
+    In-memory free/busy picture of the Finance calendar over the booking horizon.
+    Filled with one freebusy query and refreshed at most every AVAILABILITY_TTL_SECONDS,
+    so repeated availability questions are answered without a Google round trip.
+    """
+
+    def __init__(self, calendar_id: str = CALENDAR_ID, ttl: int = AVAILABILITY_TTL_SECONDS):
+        self.calendar_id = calendar_id
+        self.ttl = ttl
+        self.busy: List[Interval] = []
+        self.window: Optional[Interval] = None
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _query_busy(self, time_min: datetime, time_max: datetime) -> List[Interval]:
+        service = get_google_service()
+        result = service.freebusy().query(body={
+            "timeMin": time_min.isoformat(),
+            "timeMax": time_max.isoformat(),
+            "timeZone": "UTC",
+            "items": [{"id": self.calendar_id}],
+        }).execute()
+        periods = result.get("calendars", {}).get(self.calendar_id, {}).get("busy", [])
+        return sorted((parse_iso(p["start"]), parse_iso(p["end"])) for p in periods)
+
+    @staticmethod
+    def horizon_window() -> Interval:
+        """Midnight of the first booking date to midnight after the last one"""
+        dates = get_booking_dates()
+        return (day_bounds(dates[0], "00:00", "00:00")[0], day_bounds(dates[-1], "00:00", "00:00")[0] + timedelta(days=1))
+
+    def in_horizon(self, date_str: str) -> bool:
+        start, end = day_bounds(date_str, "00:00", "23:59")
+        window = self.horizon_window()
+        return window[0] <= start and end <= window[1]
+
+    def _is_fresh(self) -> bool:
+        """The snapshot is younger than the TTL and still covers today's horizon"""
+        if self.window is None or time.monotonic() - self.loaded_at > self.ttl:
+            return False
+        return self.window == self.horizon_window()
+
+    def refresh(self):
+        """Reloads the whole booking horizon with a single freebusy call"""
+        window = self.horizon_window()
+        busy = self._query_busy(*window)
+        with self._lock:
+            self.busy = busy
+            self.window = window
+            self.loaded_at = time.monotonic()
+        print(f"📅 Availability index refreshed: {len(busy)} busy period(s) over {(window[1] - window[0]).days} days")
+
+    def _ensure_fresh(self):
+        """Refreshes the horizon snapshot once it is older than the TTL"""
+        if self._is_fresh():
+            return
+        # Only one caller talks to Google; the rest wait and reuse its result
+        with self._refresh_lock:
+            if not self._is_fresh():
+                self.refresh()
+
+    def busy_between(self, start_date: str, end_date: str) -> List[Interval]:
+        """Busy periods overlapping the given dates (inclusive)"""
+        range_start = day_bounds(start_date, "00:00", "00:00")[0]
+        range_end = day_bounds(end_date, "00:00", "00:00")[0] + timedelta(days=1)
+        if not (self.in_horizon(start_date) and self.in_horizon(end_date)):
+            # Outside the booking horizon: one direct query, the snapshot is neither used nor refreshed
+            return self._query_busy(range_start, range_end)
+        self._ensure_fresh()
+        with self._lock:
+            return [(s, e) for s, e in self.busy if s < range_end and e > range_start]
+
+    def free_slots_range(
+        self,
+        start_date: str,
+        end_date: str,
+        slot_minutes: int = SLOT_MINUTES,
+        buffer_minutes: int = SLOT_BUFFER_MINUTES,
+    ) -> Dict[date, List[Interval]]:
+        """Free slots inside the Finance window for every working day from start_date to end_date"""
+        days = date_range(date.fromisoformat(start_date), date.fromisoformat(end_date))
+        return free_slots_by_day(
+            days,
+            lambda day: day_bounds(day.isoformat()),
+            self.busy_between(start_date, end_date),
+            slot=timedelta(minutes=slot_minutes),
+            buffer=timedelta(minutes=buffer_minutes),
+            step=timedelta(minutes=SLOT_STEP_MINUTES),
+            working_days=FINANCE_WORKING_DAYS,
+            not_before=datetime.now(timezone.utc),
+        )
+
+    def free_slots(self, date_str: str, slot_minutes: int = SLOT_MINUTES) -> List[Interval]:
+        """Free slot_minutes slots inside the Finance window on a date"""
+        return self.free_slots_range(date_str, date_str, slot_minutes)[date.fromisoformat(date_str)]
+
+    def mark_busy(self, start_iso: str, end_iso: str):
+        """Records a booking we just made so the next answer reflects it without a refresh"""
+        with self._lock:
+            insort(self.busy, (parse_iso(start_iso), parse_iso(end_iso)))
+
+
+# Shared instance used by the appointment tools
+availability_index = AvailabilityIndex()
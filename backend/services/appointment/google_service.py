@@ -1,30 +1,98 @@
 import os.path
+import threading
 import datetime
+import httplib2
+import google_auth_httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+TOKEN_PATH = 'token.json'
+# Refresh a little before Google says the token expires
+REFRESH_MARGIN = datetime.timedelta(minutes=2)
+HTTP_TIMEOUT = 15
 
-def get_google_service():
-    """Authenticates and returns the Google Calendar Service object."""
+# One service and one set of credentials per process
+_service = None
+_creds = None
+_service_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+# httplib2 is not thread-safe, so every tool worker thread keeps its own
+# keep-alive connection instead of sharing one
+_local = threading.local()
+
+def _load_credentials():
+    """Reads token.json, or runs the browser login if there is no usable token."""
     creds = None
     # The file token.json stores the user's access and refresh tokens.
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-    
+    if os.path.exists(TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+
     # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    return build('calendar', 'v3', credentials=creds)
\ No newline at end of file
+    if not creds or not (creds.valid or (creds.expired and creds.refresh_token)):
+        flow = InstalledAppFlow.from_client_secrets_file(
+            'credentials.json', SCOPES)
+        creds = flow.run_local_server(port=0)
+        _save_credentials(creds)
+    return creds
+
+def _save_credentials(creds):
+    # Save the credentials for the next run
+    with open(TOKEN_PATH, 'w') as token:
+        token.write(creds.to_json())
+
+def _needs_refresh(creds) -> bool:
+    if not creds.valid:
+        return True
+    if creds.expiry is None:
+        return False
+    # google-auth stores expiry as a naive UTC datetime
+    return creds.expiry - REFRESH_MARGIN <= datetime.datetime.utcnow()
+
+def _ensure_fresh_credentials():
+    """Refreshes the shared token once; concurrent callers wait and reuse the result."""
+    if not _needs_refresh(_creds):
+        return
+    with _refresh_lock:
+        # Another thread may have refreshed while we were waiting
+        if _needs_refresh(_creds):
+            _creds.refresh(Request())
+            _save_credentials(_creds)
+            print("🔑 Google credentials refreshed")
+
+def _thread_http():
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = google_auth_httplib2.AuthorizedHttp(_creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        _local.http = http
+    return http
+
+def _build_request(http, *args, **kwargs):
+    # Called by the client for every API request: use this thread's connection
+    _ensure_fresh_credentials()
+    return HttpRequest(_thread_http(), *args, **kwargs)
+
+def get_google_service():
+    """Returns the process-wide Google Calendar Service object."""
+    global _service, _creds
+    if _service is not None:
+        return _service
+
+    with _service_lock:
+        if _service is None:
+            _creds = _load_credentials()
+            _ensure_fresh_credentials()
+            # The static discovery document ships with the client library,
+            # so building the service never goes over the network
+            _service = build(
+                'calendar', 'v3',
+                http=_thread_http(),
+                requestBuilder=_build_request,
+                static_discovery=True,
+                cache_discovery=False,
+            )
+    return _service
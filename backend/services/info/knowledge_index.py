@@ -0,0 +1,341 @@
+# services/info/knowledge_index.py
+import os
+import re
+import sys
+import math
+import time
+import fcntl
+import sqlite3
+import asyncio
+import threading
+from collections import Counter, deque
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse, urldefrag
+from urllib import robotparser
+import httpx
+from utils.search_terms import tokenize
+
+# The whitelist of trusted domains the info agent may quote
+TRUSTED_SITES = [
+    "northumbria.ac.uk",
+    "mynsu.co.uk",
+    "linkedin.com/school/northumbria-university",
+    "northumbria.native.fm",       # <--- The REAL events calendar
+    "store.northumbria.ac.uk"      # <--- Ticketed trips and workshops
+]
+
+# Where the crawler starts. LinkedIn needs a login, so it is left to live search.
+SEED_URLS = [
+    "https://www.northumbria.ac.uk/",
+    "https://www.mynsu.co.uk/",
+    "https://northumbria.native.fm/",
+    "https://store.northumbria.ac.uk/",
+] + [u.strip() for u in os.getenv("KNOWLEDGE_SEED_URLS", "").split(",") if u.strip()]
+
+KNOWLEDGE_DB_PATH = os.getenv("KNOWLEDGE_DB_PATH", "knowledge.sqlite")
+KNOWLEDGE_MAX_PAGES = int(os.getenv("KNOWLEDGE_MAX_PAGES", "400"))
+# Rebuild the snapshot when it is older than this. 0 disables the background refresh.
+KNOWLEDGE_REFRESH_HOURS = float(os.getenv("KNOWLEDGE_REFRESH_HOURS", "24"))
+# How often each worker checks whether another one has published a newer snapshot
+KNOWLEDGE_CHECK_SECONDS = int(os.getenv("KNOWLEDGE_CHECK_SECONDS", "600"))
+# Share of the query's words the best chunk must contain before we trust local results
+KNOWLEDGE_MIN_COVERAGE = float(os.getenv("KNOWLEDGE_MIN_COVERAGE", "0.6"))
+KNOWLEDGE_MIN_SCORE = float(os.getenv("KNOWLEDGE_MIN_SCORE", "2.0"))
+
+CHUNK_WORDS = 180
+CHUNK_OVERLAP = 40
+BM25_K1 = 1.5
+BM25_B = 0.75
+USER_AGENT = "NorthumbriaStudentAssistant/1.0 (knowledge snapshot)"
+
+SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "footer", "header", "form"}
+
+
+def is_trusted(url: str) -> bool:
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().split(":")[0]
+    target = f"{host}{parsed.path}"
+    for site in TRUSTED_SITES:
+        domain = site.split("/")[0]
+        if host == domain or host.endswith("." + domain):
+            return "/" not in site or target.startswith(site) or target.startswith("www." + site)
+    return False
+
+
+class PageParser(HTMLParser):
+    """Pulls the title, visible text and links out of an HTML page"""
+
+    def __init__(self):
+        super().__init__()
+        self.title = ""
+        self.parts: List[str] = []
+        self.links: List[str] = []
+        self._skip = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip:
+            self._skip -= 1
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data.strip()
+        elif not self._skip and data.strip():
+            self.parts.append(data.strip())
+
+    @property
+    def text(self) -> str:
+        return re.sub(r"\s+", " ", " ".join(self.parts))
+
+
+def chunk_text(text: str) -> List[str]:
+    words = text.split()
+    chunks = []
+    step = CHUNK_WORDS - CHUNK_OVERLAP
+    for start in range(0, max(len(words), 1), step):
+        chunk = " ".join(words[start:start + CHUNK_WORDS])
+        if len(chunk) > 40:
+            chunks.append(chunk)
+        if start + CHUNK_WORDS >= len(words):
+            break
+    return chunks
+
+
+def crawl(seed_urls: List[str] = SEED_URLS, max_pages: int = KNOWLEDGE_MAX_PAGES) -> List[Tuple[str, str, str]]:
+    """Breadth-first crawl of the trusted sites. Returns (url, title, text) per page."""
+    robots: Dict[str, Optional[robotparser.RobotFileParser]] = {}
+    queue = deque(u for u in seed_urls if is_trusted(u))
+    seen = set(queue)
+    pages = []
+
+    with httpx.Client(timeout=10.0, follow_redirects=True, headers={"User-Agent": USER_AGENT}) as client:
+
+        def allowed(url: str) -> bool:
+            root = "{0.scheme}://{0.netloc}".format(urlparse(url))
+            if root not in robots:
+                parser = robotparser.RobotFileParser()
+                try:
+                    res = client.get(f"{root}/robots.txt")
+                    if res.status_code in (401, 403):
+                        # Access-controlled robots.txt: treat the whole site as off limits
+                        parser.disallow_all = True
+                    else:
+                        parser.parse(res.text.splitlines() if res.status_code == 200 else [])
+                    robots[root] = parser
+                except httpx.HTTPError:
+                    robots[root] = None
+            parser = robots[root]
+            return parser is None or parser.can_fetch(USER_AGENT, url)
+
+        while queue and len(pages) < max_pages:
+            url = queue.popleft()
+            if not allowed(url):
+                continue
+            try:
+                res = client.get(url)
+            except httpx.HTTPError as e:
+                print(f"Crawl failed for {url}: {e}")
+                continue
+            if res.status_code != 200 or "text/html" not in res.headers.get("content-type", ""):
+                continue
+            # Redirects are followed, so check where we ended up: an off-site page must
+            # never be indexed and later quoted as a university source
+            final_url = str(res.url)
+            if final_url != url and not (is_trusted(final_url) and allowed(final_url)):
+                print(f"Crawl skipped {url}: redirected to {final_url}")
+                continue
+            seen.add(final_url)
+
+            parser = PageParser()
+            parser.feed(res.text)
+            if parser.text:
+                pages.append((final_url, parser.title, parser.text))
+
+            for href in parser.links:
+                link, _ = urldefrag(urljoin(final_url, href))
+                if link.startswith("http") and link not in seen and is_trusted(link):
+                    seen.add(link)
+                    queue.append(link)
+
+    return pages
+
+
+class KnowledgeIndex:
+    """
+    Local snapshot of the trusted university pages: a sqlite chunk store plus an
+    in-memory BM25 index, so most info questions never leave the process.
+    """
+
+    def __init__(self, path: str = KNOWLEDGE_DB_PATH):
+        self.path = path
+        self.chunks: List[Tuple[str, str, str]] = []   # (url, title, text)
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        self.avg_length = 0.0
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._ensure_schema()
+        self.load()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _ensure_schema(self):
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS chunks (url TEXT, title TEXT, text TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS snapshot (built_at REAL)")
+
+    def snapshot_built_at(self) -> float:
+        """When the snapshot on disk was built, possibly by another worker"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(built_at) FROM snapshot").fetchone()
+        return row[0] if row and row[0] else 0.0
+
+    def reload_if_changed(self) -> bool:
+        if self.snapshot_built_at() > self.built_at:
+            self.load()
+            return True
+        return False
+
+    def load(self):
+        """Reads the chunk store and rebuilds the BM25 postings in memory"""
+        with self._connect() as conn:
+            chunks = conn.execute("SELECT url, title, text FROM chunks").fetchall()
+            row = conn.execute("SELECT MAX(built_at) FROM snapshot").fetchone()
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for i, (_, title, text) in enumerate(chunks):
+            tokens = tokenize(f"{title} {text}")
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((i, tf))
+
+        with self._lock:
+            self.chunks = chunks
+            self.postings = postings
+            self.lengths = lengths
+            self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+            self.built_at = row[0] if row and row[0] else 0.0
+        if chunks:
+            print(f"📚 Knowledge index loaded: {len(chunks)} chunks")
+
+    def refresh(self, seed_urls: List[str] = SEED_URLS, max_pages: int = KNOWLEDGE_MAX_PAGES, force: bool = True) -> bool:
+        """
+        Re-crawls the trusted sites and swaps in the new snapshot. Only one process per
+        snapshot file crawls at a time: the others return False and pick the result up
+        through reload_if_changed. Without `force`, a snapshot another process has just
+        rebuilt is loaded instead of being crawled again.
+        """
+        with self._refresh_lock, open(f"{self.path}.lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                self.reload_if_changed()
+                if not force and not self.is_stale():
+                    return False
+                self._rebuild(seed_urls, max_pages)
+                return True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _rebuild(self, seed_urls: List[str], max_pages: int):
+        pages = crawl(seed_urls, max_pages)
+        if not pages:
+            print("Knowledge refresh found no pages, keeping the old snapshot")
+            return
+        rows = [(url, title, chunk) for url, title, text in pages for chunk in chunk_text(text)]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks")
+            conn.executemany("INSERT INTO chunks (url, title, text) VALUES (?, ?, ?)", rows)
+            conn.execute("DELETE FROM snapshot")
+            conn.execute("INSERT INTO snapshot (built_at) VALUES (?)", (time.time(),))
+        print(f"📚 Knowledge snapshot rebuilt: {len(pages)} pages, {len(rows)} chunks")
+        self.load()
+
+    def is_stale(self) -> bool:
+        return time.time() - self.built_at > KNOWLEDGE_REFRESH_HOURS * 3600
+
+    def search(self, query: str, k: int = 3) -> List[Dict]:
+        """Top-k chunks by BM25, each with its score and the share of query words it covers"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            n = len(self.chunks)
+            if not terms or not n:
+                return []
+            scores: Dict[int, float] = {}
+            matched: Dict[int, int] = {}
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for i, tf in postings:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.avg_length)
+                    scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    matched[i] = matched.get(i, 0) + 1
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                {
+                    "url": self.chunks[i][0],
+                    "title": self.chunks[i][1],
+                    "content": self.chunks[i][2],
+                    "score": score,
+                    "coverage": matched[i] / len(terms),
+                }
+                for i, score in best
+            ]
+
+    def confident_search(self, query: str, k: int = 3) -> Optional[List[Dict]]:
+        """Local results if the best one clears the recall thresholds, otherwise None"""
+        results = self.search(query, k)
+        if results and results[0]["coverage"] >= KNOWLEDGE_MIN_COVERAGE and results[0]["score"] >= KNOWLEDGE_MIN_SCORE:
+            return results
+        return None
+
+
+# Shared instance used by the info search tool
+knowledge_index = KnowledgeIndex()
+
+
+async def refresh_forever():
+    """
+    Background job run by every API worker. Whichever worker takes the snapshot lock
+    rebuilds it once it is older than KNOWLEDGE_REFRESH_HOURS; the rest just reload
+    the new snapshot from disk when they next check.
+    """
+    if KNOWLEDGE_REFRESH_HOURS <= 0:
+        return
+    while True:
+        try:
+            await asyncio.to_thread(knowledge_index.reload_if_changed)
+            if knowledge_index.is_stale():
+                await asyncio.to_thread(knowledge_index.refresh, force=False)
+        except Exception as e:
+            print(f"Knowledge refresh failed: {e}")
+        await asyncio.sleep(KNOWLEDGE_CHECK_SECONDS)
+
+
+if __name__ == "__main__":
+    # python -m services.info.knowledge_index [max_pages]
+    if not knowledge_index.refresh(max_pages=int(sys.argv[1]) if len(sys.argv) > 1 else KNOWLEDGE_MAX_PAGES):
+        print("Another process is rebuilding the knowledge snapshot right now")
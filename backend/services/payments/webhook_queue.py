@@ -0,0 +1,250 @@
+# services/payments/webhook_queue.py
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from database.ledger import apply_payment, apply_payments
+
+# Durable local queue: events survive a crash between acknowledging Stripe and applying them
+WEBHOOK_QUEUE_PATH = os.getenv("WEBHOOK_QUEUE_PATH", "webhook_queue.sqlite")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "25"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+# An event claimed this long ago without finishing belongs to a crashed worker
+WEBHOOK_CLAIM_TIMEOUT = int(os.getenv("WEBHOOK_CLAIM_TIMEOUT_SECONDS", "300"))
+# How long finished events are remembered for dedupe. Stripe retries for up to 3 days.
+WEBHOOK_RETENTION_DAYS = float(os.getenv("WEBHOOK_RETENTION_DAYS", "30"))
+POLL_SECONDS = 1.0
+
+
+class WebhookQueue:
+    """sqlite-backed queue shared by every worker process on this node"""
+
+    def __init__(self, path: str = WEBHOOK_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id     TEXT NOT NULL,
+                    type         TEXT NOT NULL,
+                    payload      TEXT NOT NULL,
+                    status       TEXT NOT NULL DEFAULT 'pending',
+                    attempts     INTEGER NOT NULL DEFAULT 0,
+                    last_error   TEXT,
+                    received_at  REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    claimed_at   REAL,
+                    outcome      TEXT,
+                    finished_at  REAL
+                )
+                """
+            )
+            # Queues created before events were deduplicated
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(events)")}
+            for column, kind in (("outcome", "TEXT"), ("finished_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE events ADD COLUMN {column} {kind}")
+            conn.execute("DELETE FROM events WHERE id NOT IN (SELECT MIN(id) FROM events GROUP BY event_id)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS events_event_id ON events (event_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS events_ready ON events (status, available_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS events_finished ON events (finished_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite handles locking between processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Stores the event unless its id was seen before. Returns False for a redelivery."""
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT OR IGNORE INTO events (event_id, type, payload, received_at, available_at) VALUES (?, ?, ?, ?, ?)",
+            (event["id"], event["type"], json.dumps(event), now, now),
+        )
+        return cursor.rowcount == 1
+
+    def lookup(self, event_id: str) -> Optional[Dict[str, Any]]:
+        """Status and recorded outcome of one event, or None if it was never received"""
+        row = self._conn().execute(
+            "SELECT event_id, type, status, attempts, outcome, last_error, received_at, finished_at "
+            "FROM events WHERE event_id = ?",
+            (event_id,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, limit: int) -> List[sqlite3.Row]:
+        """Atomically marks up to `limit` ready events as processing and returns them"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Give events held by a crashed worker back to the queue
+            conn.execute(
+                "UPDATE events SET status = 'pending' WHERE status = 'processing' AND claimed_at < ?",
+                (now - WEBHOOK_CLAIM_TIMEOUT,),
+            )
+            rows = conn.execute(
+                "SELECT * FROM events WHERE status = 'pending' AND available_at <= ? ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE events SET status = 'processing', claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now, row["id"]) for row in rows],
+                )
+            conn.execute("COMMIT")
+            return rows
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def complete(self, outcomes: Dict[int, str]):
+        """Marks events done, recording what processing each one did"""
+        now = time.time()
+        self._conn().executemany(
+            "UPDATE events SET status = 'done', outcome = ?, finished_at = ?, last_error = NULL WHERE id = ?",
+            [(outcome, now, i) for i, outcome in outcomes.items()],
+        )
+
+    def fail(self, row: sqlite3.Row, error: str):
+        """Schedules a retry with exponential backoff, or parks the event after too many attempts"""
+        attempts = row["attempts"] + 1
+        now = time.time()
+        if attempts >= WEBHOOK_MAX_ATTEMPTS:
+            status, available_at, finished_at = "failed", now, now
+            print(f"❌ Webhook event {row['event_id']} failed permanently: {error}")
+        else:
+            status, available_at, finished_at = "pending", now + min(2 ** attempts, 300), None
+        self._conn().execute(
+            "UPDATE events SET status = ?, available_at = ?, last_error = ?, finished_at = ? WHERE id = ?",
+            (status, available_at, error, finished_at, row["id"]),
+        )
+
+    def prune(self, retention_days: float = WEBHOOK_RETENTION_DAYS) -> int:
+        """Forgets finished events older than the retention window. Returns rows removed."""
+        cursor = self._conn().execute(
+            "DELETE FROM events WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (time.time() - retention_days * 86400,),
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM events GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def payment_from_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The ledger update a Stripe event asks for, or None if we don't act on it"""
+    if event["type"] != "checkout.session.completed":
+        return None
+    session = event["data"]["object"]
+    return {
+        "student_id": session["metadata"].get("student_id"),
+        "stripe_session_id": session["id"],
+        "amount": float(session["amount_total"] / 100),  # Convert pence to pounds
+    }
+
+
+def process_batch(queue: WebhookQueue, limit: int = WEBHOOK_BATCH_SIZE) -> int:
+    """Claims ready events and applies their payments with one batched write. Returns events handled."""
+    rows = queue.claim(limit)
+    if not rows:
+        return 0
+
+    done: Dict[int, str] = {}
+    payments = []
+    for row in rows:
+        try:
+            payment = payment_from_event(json.loads(row["payload"]))
+        except Exception as e:
+            # A malformed payload only fails its own event, never the rest of the batch
+            queue.fail(row, f"malformed event: {e!r}")
+            continue
+        if payment:
+            payments.append((row, payment))
+        else:
+            done[row["id"]] = f"ignored: {row['type']}"
+
+    if payments:
+        try:
+            balances = apply_payments([p for _, p in payments])
+            for row, payment in payments:
+                balance = balances.get(payment["stripe_session_id"])
+                print(f"✅ Balance Updated: {payment['student_id']} now owes £{balance}")
+                done[row["id"]] = f"applied: balance £{balance}"
+        except Exception as e:
+            # One bad event must not hold the rest back: retry them one by one
+            print(f"Batched ledger update failed ({e}), applying individually")
+            for row, payment in payments:
+                try:
+                    balance = apply_payment(payment["student_id"], payment["stripe_session_id"], payment["amount"])
+                    done[row["id"]] = f"applied: balance £{balance}"
+                except Exception as single_error:
+                    queue.fail(row, str(single_error))
+
+    queue.complete(done)
+    return len(rows)
+
+
+webhook_queue = WebhookQueue()
+_wakeup: Optional[asyncio.Event] = None
+_workers: List[asyncio.Task] = []
+
+
+async def enqueue_event(event: Dict[str, Any]) -> bool:
+    """Persists a verified Stripe event and wakes a worker. Returns False if it was already received."""
+    queued = await asyncio.to_thread(webhook_queue.enqueue, event)
+    if queued and _wakeup is not None:
+        _wakeup.set()
+    return queued
+
+
+async def _worker(n: int):
+    last_prune = 0.0
+    while True:
+        if n == 0 and time.time() - last_prune > 3600:
+            last_prune = time.time()
+            try:
+                pruned = await asyncio.to_thread(webhook_queue.prune)
+                if pruned:
+                    print(f"🧹 Forgot {pruned} webhook events past the retention window")
+            except Exception as e:
+                print(f"Webhook prune failed: {e}")
+        try:
+            handled = await asyncio.to_thread(process_batch, webhook_queue)
+        except Exception as e:
+            print(f"Webhook worker {n} error: {e}")
+            handled = 0
+        if not handled:
+            # Idle: sleep until a new event arrives or the poll interval passes
+            try:
+                await asyncio.wait_for(_wakeup.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+
+
+def start_webhook_workers():
+    """Starts the background appliers. Call on app startup."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    for n in range(WEBHOOK_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n)))
+
+
+def stop_webhook_workers():
+    """Stops the background appliers. Pending events stay queued for the next start."""
+    for task in _workers:
+        task.cancel()
+    _workers.clear()
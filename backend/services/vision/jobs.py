@@ -0,0 +1,78 @@
+# services/vision/jobs.py
+# Runs inside the vision worker processes only. The API process never imports this
+# module, so torch (EasyOCR) and dlib (face_recognition) stay out of the web workers.
+import io
+from typing import List, Optional, Tuple
+import numpy as np
+import easyocr
+import face_recognition
+from PIL import Image
+from utils.face_encodings import decoded_image, id_card_encodings, precompute_id_card_encodings, forget_id_card_encodings
+
+_reader: Optional[easyocr.Reader] = None
+
+
+def get_reader() -> easyocr.Reader:
+    global _reader
+    if _reader is None:
+        _reader = easyocr.Reader(['en'])
+    return _reader
+
+
+def warm_models():
+    """Process initializer: loads the OCR and face models once, before the first job arrives"""
+    get_reader()
+    face_recognition.face_encodings(np.zeros((32, 32, 3), dtype=np.uint8))
+    print("👁️ Vision worker ready")
+
+
+def ping() -> bool:
+    return True
+
+
+def read_text(image_bytes: bytes) -> List[str]:
+    """Text lines EasyOCR finds in the image"""
+    img = Image.open(io.BytesIO(image_bytes))
+    img = img.convert("RGB")
+    return get_reader().readtext(np.array(img), detail=0)  # only text
+
+
+def read_text_lines(image_url: str) -> List[Tuple[str, float]]:
+    """(text, confidence) for each line EasyOCR finds on the image at `image_url`"""
+    # Same decoded array the face check uses, so the card is decoded once for both
+    img = decoded_image(image_url)
+    return [(text, float(confidence)) for _, text, confidence in get_reader().readtext(img)]
+
+
+def match_faces(live_image_url: str, id_card_url: str) -> str:
+    """Compares the selfie against the ID card; the card's faceprints come from the encoding store"""
+    # 1. Load the live image (downloaded and decoded once, shared with the other vision tools)
+    img_live = decoded_image(live_image_url)
+
+    # 2. Get Encodings (Faceprints)
+    # We assume the ID source has 1 face (the student)
+    # The card is encoded once, usually right after extraction, so retries only encode the selfie
+    id_encodings = id_card_encodings(id_card_url)
+    if not id_encodings:
+        return "Error: Could not detect a clear face in the original ID card upload."
+
+    # The live image might have 2 faces (Real Person + Face on the ID they are holding)
+    # We grab ALL faces in the live image
+    live_encodings = face_recognition.face_encodings(img_live)
+    if not live_encodings:
+        return "Error: Could not detect any face in the webcam photo. Ensure good lighting."
+
+    # 3. Compare
+    # We check if the ID Face matches ANY face found in the webcam shot
+    known_face = id_encodings[0]
+
+    # Compare known face against all live faces
+    results = face_recognition.compare_faces(live_encodings, known_face, tolerance=0.5)
+
+    if True in results:
+        # Verified: the card's faceprints are not kept on disk any longer than needed
+        forget_id_card_encodings(id_card_url)
+        return "✅ BIOMETRIC VERIFIED: The person in the camera matches the ID card."
+    else:
+        return "❌ VERIFICATION FAILED: The face in the camera does not match the ID card."
+
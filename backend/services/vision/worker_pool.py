@@ -0,0 +1,163 @@
+# services/vision/worker_pool.py
+import os
+import asyncio
+import functools
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+# Every uvicorn worker process owns a pool, so the host's vision budget (half its cores)
+# is split between them. VISION_WORKERS is per API process when set explicitly.
+API_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+VISION_WORKERS = int(os.getenv("VISION_WORKERS", str(max(1, (os.cpu_count() or 2) // 2 // API_PROCESSES))))
+# Jobs allowed to wait for a free worker (per API process) before new ones are turned away
+VISION_MAX_QUEUED = int(os.getenv("VISION_MAX_QUEUED", str(VISION_WORKERS * 4)))
+VISION_JOB_TIMEOUT_SECONDS = float(os.getenv("VISION_JOB_TIMEOUT_SECONDS", "45"))
+JOBS_MODULE = "services.vision.jobs"
+
+
+class VisionBusyError(Exception):
+    """Raised when the vision queue is full; the caller should ask the student to retry shortly"""
+
+
+def _warm():
+    importlib.import_module(JOBS_MODULE).warm_models()
+
+
+def _run_job(name: str, args: tuple):
+    # Runs inside a worker process
+    return getattr(importlib.import_module(JOBS_MODULE), name)(*args)
+
+
+class VisionPool:
+    """
+    Pre-warmed worker processes for OCR and face jobs. Submission is bounded:
+    at most `workers` jobs run and `max_queued` wait; beyond that callers get
+    VisionBusyError straight away instead of piling up behind a slow queue.
+    """
+
+    def __init__(self, workers: int = VISION_WORKERS, max_queued: int = VISION_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "rejected": 0, "restarts": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the parent is running an event loop and several threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm,
+            )
+        return self._executor
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> bool:
+        """Drops `executor` if it is still the current pool; the next submit starts a fresh one. Call with _lock held."""
+        if self._executor is not executor:
+            return False
+        self._executor = None
+        self.stats["restarts"] += 1
+        return True
+
+    def _finished(self, executor: ProcessPoolExecutor, future: Future):
+        broken = False
+        with self._lock:
+            self._outstanding -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.stats["failed"] += 1
+                # A worker died mid-job (e.g. a native crash in dlib): every job on this pool fails with it
+                broken = isinstance(future.exception(), BrokenProcessPool) and self._replace_broken(executor)
+            else:
+                self.stats["completed"] += 1
+        if broken:
+            print("⚠️ Vision pool broken, restarting workers")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, name: str, *args: Any) -> Future:
+        """Queues a job by its name in services/vision/jobs.py"""
+        with self._lock:
+            if self._outstanding >= self.workers + self.max_queued:
+                self.stats["rejected"] += 1
+                raise VisionBusyError("The ID checker is busy right now, please try again in a moment.")
+            self._outstanding += 1
+            self.stats["submitted"] += 1
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_run_job, name, args)
+            except BrokenProcessPool:
+                # The pool broke before any of its futures told us: start a fresh one once
+                print("⚠️ Vision pool broken, restarting workers")
+                self._replace_broken(executor)
+                executor.shutdown(wait=False, cancel_futures=True)
+                try:
+                    executor = self._get_executor()
+                    future = executor.submit(_run_job, name, args)
+                except Exception:
+                    self._outstanding -= 1
+                    raise
+            except Exception:
+                self._outstanding -= 1
+                raise
+        future.add_done_callback(functools.partial(self._finished, executor))
+        return future
+
+    def run_sync(self, name: str, *args: Any, timeout: float = VISION_JOB_TIMEOUT_SECONDS) -> Any:
+        """Blocking call for sync tools running in the tool thread pool"""
+        future = self.submit(name, *args)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The worker can't be interrupted; the late result is simply dropped
+            future.cancel()
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise TimeoutError(f"Vision job '{name}' timed out after {timeout:g}s")
+
+    async def run(self, name: str, *args: Any, timeout: float = VISION_JOB_TIMEOUT_SECONDS) -> Any:
+        future = self.submit(name, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise TimeoutError(f"Vision job '{name}' timed out after {timeout:g}s")
+
+    def submit_background(self, name: str, *args: Any):
+        """Fire-and-forget job, e.g. warming caches; failures and a full queue are only logged"""
+        try:
+            future = self.submit(name, *args)
+        except VisionBusyError:
+            print(f"Vision queue full, skipped background job {name}")
+            return
+
+        def log_failure(done: Future):
+            if not done.cancelled() and done.exception() is not None:
+                print(f"Background vision job {name} failed: {done.exception()}")
+
+        future.add_done_callback(log_failure)
+
+    def start(self):
+        """Spawns every worker up front so the models are loaded before the first upload"""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_run_job, "ping", ())
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "workers": self.workers, "outstanding": self._outstanding}
+
+
+# Shared instance used by the payment vision tools
+vision_pool = VisionPool()
@@ -1,4 +1,5 @@
 # test_appointment.py
+import asyncio
 from langchain_core.messages import HumanMessage
 from agents.appointment_agent import appointment_app # Import the app we just built
 
@@ -29,24 +30,28 @@ while True:
     
     print("--- Graph Running ---")
     
-    # stream() allows us to see each step (Agent -> Tool -> Agent)
-    for event in appointment_app.stream(inputs, config=config, stream_mode="values"):
-        
-        # Get the latest message from the current step
-        current_messages = event["messages"]
-        last_msg = current_messages[-1]
-        
-        # Print based on who sent the message
-        if last_msg.type == "ai":
-            # Only print if there is text (sometimes AI just sends tool calls)
-            if last_msg.content:
-                print(f"🤖 Agent: {last_msg.content}")
+    # astream() allows us to see each step (Agent -> Tool -> Agent)
+    # The agent and tool nodes are async, so the graph has to be driven from an event loop
+    async def run_turn():
+        async for event in appointment_app.astream(inputs, config=config, stream_mode="values"):
             
-            # If it has tool calls, indicate that
-            if last_msg.tool_calls:
-                print(f"   (Agent requesting: {[t['name'] for t in last_msg.tool_calls]})")
+            # Get the latest message from the current step
+            current_messages = event["messages"]
+            last_msg = current_messages[-1]
+            
+            # Print based on who sent the message
+            if last_msg.type == "ai":
+                # Only print if there is text (sometimes AI just sends tool calls)
+                if last_msg.content:
+                    print(f"🤖 Agent: {last_msg.content}")
                 
-        elif last_msg.type == "tool":
-            print(f"🛠️ Tool Output: {last_msg.content}")
+                # If it has tool calls, indicate that
+                if last_msg.tool_calls:
+                    print(f"   (Agent requesting: {[t['name'] for t in last_msg.tool_calls]})")
+                    
+            elif last_msg.type == "tool":
+                print(f"🛠️ Tool Output: {last_msg.content}")
+
+    asyncio.run(run_turn())
             
     print("---------------------\n")
\ No newline at end of file
@@ -1,5 +1,5 @@
 from tools.appointment.book_meeting import book_meeting
-from utils.supabase_client import supabase
+from utils.supabase_client import db_call_sync
 from langchain_core.tools import tool
 
 @tool
@@ -42,11 +42,11 @@ def book_appointment_ticket(student_email: str, start_iso: str, end_iso: str):
 
     # --- STEP 2: The Ticket Generation (Supabase) ---
     # We only reach here if Step 1 was successful
-    data = supabase.table("appointments").insert({
+    data = db_call_sync("appointments.insert", lambda db: db.table("appointments").insert({
         "student_email": student_email,
         "appointment_time": start_iso,
         "status": "confirmed"
-    }).execute()
+    }).execute())
     
     ticket_id = data.data[0]['ticket_id']
     
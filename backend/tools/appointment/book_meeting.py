@@ -1,4 +1,5 @@
 from services.appointment.google_service import get_google_service
+from services.appointment.availability_index import availability_index
 from langchain_core.tools import tool
 
 @tool
@@ -33,6 +34,8 @@ def book_meeting(student_email: str, start_time_iso: str, end_time_iso: str):
 
     try:
         event = service.events().insert(calendarId='primary', body=event, sendUpdates='all').execute()
+        # Keep the availability index in step so the slot isn't offered again
+        availability_index.mark_busy(start_time_iso, end_time_iso)
         return f"Meeting created! Link: {event.get('htmlLink')}"
     except Exception as e:
         return f"Failed to book meeting: {str(e)}"
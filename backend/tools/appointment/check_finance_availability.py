@@ -1,4 +1,4 @@
-from services.appointment.google_service import get_google_service
+from services.appointment.availability_index import availability_index, FINANCE_DAY_START, FINANCE_DAY_END, SLOT_MINUTES
 from langchain_core.tools import tool
 
 @tool
@@ -6,33 +6,19 @@ def check_finance_availability(date_str: str):
     """
     Checks the Finance Team's availability for a specific date (YYYY-MM-DD).
     Strictly checks the window 13:00 to 16:00 (1 PM to 4 PM).
+    Returns the free 30-minute slots.
     """
     print(date_str, "this is the date")
-    service = get_google_service()
-    
-    # 1. Define the 1-4 PM window (RFC3339 format required by Google)
-    # e.g., '2023-10-27T13:00:00Z'
-    time_min = f"{date_str}T13:00:00Z"
-    time_max = f"{date_str}T16:00:00Z"
-    
-    # 2. Query the 'primary' calendar (The Finance Team's calendar)
-    events_result = service.events().list(
-        calendarId='primary', 
-        timeMin=time_min, 
-        timeMax=time_max, 
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    
-    events = events_result.get('items', [])
 
-    if not events:
-        return f"The Finance Team is fully open between 1 PM and 4 PM on {date_str}."
-    
-    # Format busy slots nicely for the LLM
-    busy_slots = []
-    for event in events:
-        start = event['start'].get('dateTime', event['start'].get('date'))
-        busy_slots.append(f"Busy from {start}")
-        
-    return f"The Finance Team has bookings: {', '.join(busy_slots)}. Please pick a different time in the 1-4 PM window."
\ No newline at end of file
+    # Answered from the cached free/busy index, not a fresh calendar query
+    slots = availability_index.free_slots(date_str, SLOT_MINUTES)
+
+    if not slots:
+        return f"The Finance Team has no free slots between 1 PM and 4 PM on {date_str}. Please pick a different date."
+
+    # Format free slots nicely for the LLM
+    free_slots = [f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in slots]
+    return (
+        f"The Finance Team has these free {SLOT_MINUTES}-minute slots on {date_str} "
+        f"({FINANCE_DAY_START}-{FINANCE_DAY_END}): {', '.join(free_slots)}."
+    )
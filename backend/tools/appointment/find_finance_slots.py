@@ -0,0 +1,38 @@
+from datetime import date
+from services.appointment.availability_index import availability_index, FINANCE_DAY_START, FINANCE_DAY_END, SLOT_MINUTES, MIN_SLOT_MINUTES, MAX_SLOT_MINUTES
+from utils.date_cheat_sheet import BOOKING_HORIZON_DAYS
+from langchain_core.tools import tool
+
+@tool
+def find_finance_slots(start_date: str, end_date: str, slot_minutes: int = SLOT_MINUTES):
+    """
+    Lists every free Finance Team slot between two dates (YYYY-MM-DD, inclusive) in one call.
+    Only Mon-Fri, 13:00 to 16:00 (1 PM to 4 PM) is bookable.
+    Use this when the student is flexible or asks about several days ("this week", "Tue or Wed").
+    """
+    if not MIN_SLOT_MINUTES <= slot_minutes <= MAX_SLOT_MINUTES:
+        return f"Error: slot_minutes must be between {MIN_SLOT_MINUTES} and {MAX_SLOT_MINUTES}."
+    try:
+        first, last = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    except ValueError:
+        return "Error: dates must be in YYYY-MM-DD format."
+    if last < first:
+        first, last = last, first
+    if (last - first).days >= BOOKING_HORIZON_DAYS:
+        return f"Error: please ask for at most {BOOKING_HORIZON_DAYS} days at a time."
+
+    slots_by_day = availability_index.free_slots_range(first.isoformat(), last.isoformat(), slot_minutes)
+
+    lines = []
+    for day, slots in slots_by_day.items():
+        label = f"{day.strftime('%A')} {day.isoformat()}"
+        if slots:
+            times = ", ".join(f"{s.strftime('%H:%M')}-{e.strftime('%H:%M')}" for s, e in slots)
+            lines.append(f"- {label}: {times}")
+        else:
+            lines.append(f"- {label}: no free slots")
+
+    return (
+        f"Free {slot_minutes}-minute Finance Team slots ({FINANCE_DAY_START}-{FINANCE_DAY_END}):\n"
+        + "\n".join(lines)
+    )
@@ -1,7 +1,6 @@
 import os
-from supabase import create_client
 from langchain_core.tools import tool
-from utils.supabase_client import supabase
+from database.student_registry import student_registry
 
 @tool
 def lookup_student(email: str):
@@ -10,11 +9,10 @@ def lookup_student(email: str):
     Returns the student's details if found, or 'NOT_FOUND' if not.
     """
     try:
-        # Case-insensitive search
-        response = supabase.table("students").select("*").ilike("email", email).execute()
+        # Case-insensitive lookup in the local registry copy
+        student = student_registry.get_by_email(email)
         
-        if response.data and len(response.data) > 0:
-            student = response.data[0]
+        if student:
             return f"FOUND: Name:  {student['name']}, Course: {student['course']}, Year Admitted: {student['year_admitted']}"
         else:
             return "NOT_FOUND"
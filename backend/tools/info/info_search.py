@@ -3,6 +3,9 @@ import os
 from langchain_tavily import TavilySearch
 from langchain_core.tools import tool
 from tavily import TavilyClient # Direct import, no LangChain wrapper
+from services.info.knowledge_index import knowledge_index, TRUSTED_SITES
+from utils.search_cache import search_cache, normalize_query, ttl_for_results
+from utils.result_compressor import compress_results
 
 # Set this in your .env file: TAVILY_API_KEY=tvly-...
 tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
@@ -10,46 +13,56 @@ tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
 # max_results=3 means it reads the top 3 pages fully
 search_tool = TavilySearch(max_results=3)
 
+def format_results(query, results):
+    """Format the results nicely for the LLM"""
+    # Tavily returns a list of dicts: [{'url': '...', 'content': '...'}]
+    # Only the passages relevant to the query are kept, within a token budget
+    context = ""
+    for res in compress_results(query, results):
+        context += f"\nSource: {res['url']}\nContent: {res['content']}\n"
+    return context
+
 @tool
 def search_university_info(query: str):
     """
     Performs a deep search for Northumbria University information.
     Returns actual page content, not just snippets.
+    Uses the local snapshot of the university sites first and live web search as a fallback.
     """
-    # 1. Define the whitelist of trusted domains
-    trusted_sites = [
-        "northumbria.ac.uk",
-        "mynsu.co.uk",
-        "linkedin.com/school/northumbria-university",
-        "northumbria.native.fm",       # <--- The REAL events calendar
-        "store.northumbria.ac.uk"      # <--- Ticketed trips and workshops
-    ]
-    
+    # 1. Answer from the local snapshot of the trusted sites when it clearly covers the question
+    local_results = knowledge_index.confident_search(query)
+    if local_results:
+        print(f"📚 Local knowledge hit ({local_results[0]['score']:.1f}): {query}")
+        return format_results(query, local_results)
+
     # 2. Join them with OR
     # Result: "(site:northumbria.ac.uk OR site:mynsu.co.uk OR ...)"
-    domain_filter = " OR ".join([f"site:{d}" for d in trusted_sites])
+    domain_filter = " OR ".join([f"site:{d}" for d in TRUSTED_SITES])
     
     site_query = f"({domain_filter}) {query}"
     
+    # 3. Serve repeated questions from the cache
+    cache_key = normalize_query(query)
+    results = search_cache.get(cache_key)
+
     try:
-        response = tavily_client.search(
-            query=site_query, 
-            search_depth="advanced", 
-            max_results=3
-        )
-        
-        # 4. Parse Results
-        results = response.get("results", [])
+        if results is None:
+            response = tavily_client.search(
+                query=site_query, 
+                search_depth="advanced", 
+                max_results=3
+            )
+            
+            # 4. Parse Results
+            results = response.get("results", [])
+            if results:
+                search_cache.put(cache_key, results, ttl_for_results(results))
+        else:
+            print(f"⚡ Search cache hit: {cache_key}")
 
         if not results:
             return "No information found on the university websites."
         
-        # Format the results nicely for the LLM
-        # Tavily returns a list of dicts: [{'url': '...', 'content': '...'}]
-        context = ""
-        for res in results:
-            context += f"\nSource: {res['url']}\nContent: {res['content']}\n"
-            
-        return context
+        return format_results(query, results)
     except Exception as e:
         return f"Search failed: {e}"
\ No newline at end of file
@@ -3,7 +3,7 @@ import os
 from typing_extensions import TypedDict
 from langchain.tools import tool
 from graph.state import UniversityState
-from utils.supabase_client import supabase
+from utils.supabase_client import db_call_sync
 
 class PaymentDTO(TypedDict):
     student_name: str | None
@@ -47,12 +47,12 @@ def create_payment_link(amount: float, student_id: str):
         )
         
         # 3. Log 'Pending' Record in Supabase
-        supabase.table("payments").insert({
+        db_call_sync("payments.insert", lambda db: db.table("payments").insert({
             "student_id": student_id,
             "amount": amount,
             "stripe_session_id": session.id,
             "status": "pending"
-        }).execute()
+        }).execute())
         
         return f"Payment Link Created: {session.url}"
         
@@ -69,13 +69,13 @@ def verify_payment_status(student_id: str):
     
     try:
         # 1. Look for the most recent SUCCESSFUL payment
-        payment_res = supabase.table("payments") \
+        payment_res = db_call_sync("payments.latest_paid", lambda db: db.table("payments") \
             .select("*") \
             .eq("student_number", student_id) \
             .eq("status", "paid") \
             .order("created_at", desc=True) \
             .limit(1) \
-            .execute()
+            .execute())
 
         if not payment_res.data:
              return "❌ I cannot see the payment yet. Please wait a moment and try again."
@@ -85,10 +85,10 @@ def verify_payment_status(student_id: str):
         current_balance = payment['balance_after'] # The webhook calculated this!
         
         # 2. Get the Due Date from Students Table
-        student_res = supabase.table("students") \
+        student_res = db_call_sync("students.next_payment_due", lambda db: db.table("students") \
             .select("next_payment_due") \
             .eq("student_id", student_id) \
-            .execute()
+            .execute())
             
         due_date = "2025-09-01" # Default fallback
         if student_res.data and student_res.data[0]['next_payment_due']:
@@ -1,12 +1,26 @@
 from langchain.tools import tool
-import io
-from PIL import Image
-import numpy as np
-import easyocr
+import os
 import re
+from typing import Optional
+from services.vision.worker_pool import vision_pool
+from database.student_registry import student_registry
 
-# Initialize EasyOCR reader
-reader = easyocr.Reader(['en'])
+# Local OCR is trusted only above this per-line confidence; below it the card goes to GPT-4o
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "0.8"))
+# Registry ids are 8 digits (e.g. 24060719)
+STUDENT_ID_RE = re.compile(os.getenv("STUDENT_ID_PATTERN", r"\d{8}"))
+NAME_STOPWORDS = {"registration", "number", "student", "name", "course", "id", "card", "valid", "expires"}
+# Longest name the local read may return. A capture reaching this cap may have been cut
+# short (or run into the next field), so those cards go to GPT-4o instead.
+LOCAL_NAME_MAX_WORDS = 3
+# "STUDENT NAME: ...", "NAME: ..." and plain "STUDENT ..." layouts, most specific label first
+NAME_LABEL_RES = [
+    re.compile(
+        label + r"\s*:?\s+([A-Z][A-Za-z'-]+(?:\s+[A-Z][A-Za-z'-]+){0,%d})" % LOCAL_NAME_MAX_WORDS,
+        re.IGNORECASE,
+    )
+    for label in (r"\bSTUDENT\s+NAME", r"\bNAME", r"\bSTUDENT")
+]
 
 def parse_student_info(ocr_text):
     # name_match = re.search(r"STUDENT\s+([A-Z\s]+)", ocr_text)
@@ -29,14 +43,74 @@ def parse_student_info(ocr_text):
         "registration_number": reg_match.group(1).strip() if reg_match else None
     }
 
+def _field_confidence(value, lines):
+    """Lowest OCR confidence among the lines the value was read from"""
+    words = set(value.lower().split())
+    scores = [conf for text, conf in lines if words & set(text.lower().split()) or value.lower() in text.lower()]
+    return min(scores) if scores else 0.0
+
+def _labelled_name(ocr_text):
+    """
+    Words after the first name label that yields any, stopping at the next label word.
+    Captures one word past LOCAL_NAME_MAX_WORDS so a cut-off name can be told apart.
+    """
+    for pattern in NAME_LABEL_RES:
+        for match in pattern.finditer(ocr_text):
+            words = []
+            for word in match.group(1).split():
+                if word.lower() in NAME_STOPWORDS:
+                    break
+                words.append(word)
+            if words:
+                return " ".join(words)
+    return None
+
+def _same_name(read, registered):
+    """Every word read off the card appears in the registry name (middle names may be missing on the card)"""
+    registered_words = set(re.findall(r"[a-z'-]+", (registered or "").lower()))
+    return bool(registered_words) and set(read.lower().split()) <= registered_words
+
+def extract_student_info_locally(image_url: str) -> Optional[dict]:
+    """
+    Reads the card with local OCR. Returns {full_name, student_id} only when both
+    fields parse, every line they came from clears OCR_MIN_CONFIDENCE, the id looks
+    like a registry id and the name matches the registry's name for that id;
+    otherwise None so the caller can escalate.
+    """
+    try:
+        lines = vision_pool.run_sync("read_text_lines", image_url)
+    except Exception as e:
+        print(f"Local OCR unavailable, escalating: {e}")
+        return None
+
+    ocr_text = " ".join(text for text, _ in lines)
+    name, student_id = _labelled_name(ocr_text), parse_student_info(ocr_text)["registration_number"]
+    if not (name and student_id):
+        return None
+    # A one-word "full name" is usually a truncated read, one at the cap may be cut off
+    if not 2 <= len(name.split()) <= LOCAL_NAME_MAX_WORDS or not STUDENT_ID_RE.fullmatch(student_id):
+        return None
+
+    confidence = min(_field_confidence(name, lines), _field_confidence(student_id, lines))
+    print(f"🔤 Local OCR: {name} / {student_id} (confidence {confidence:.2f})")
+    if confidence < OCR_MIN_CONFIDENCE:
+        return None
+    # Confident but wrong reads (a misread digit, a neighbouring field) rarely agree with the registry
+    try:
+        student = student_registry.get_by_id(student_id)
+    except Exception as e:
+        print(f"Registry check unavailable, escalating: {e}")
+        return None
+    if not student or not _same_name(name, student.get("name")):
+        print("🔤 Local OCR read does not match the registry, escalating")
+        return None
+    return {"full_name": name.title() if name.isupper() else name, "student_id": student_id}
+
 @tool("extract_name_from_id", return_direct=False, description="Generates student name from id image")
 def extract_name_from_id(image_bytes: bytes) -> str:
     """Extract text from image using EasyOCR."""
-    img = Image.open(io.BytesIO(image_bytes))
-    img = img.convert("RGB")
-    img_np = np.array(img)
-
-    results = reader.readtext(img_np, detail=0)  # only text
+    # The reader lives in the vision workers, loaded once per process
+    results = vision_pool.run_sync("read_text", image_bytes)
     extracted_text = " ".join(results)
     print("OCR results:", results)
     return parse_student_info(extracted_text)
@@ -1,9 +1,10 @@
 import base64
-import httpx 
 import os
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
+from utils.image_cache import image_cache, ImageDownloadError
+from tools.payment.extract_name import extract_student_info_locally
 
 api_key = os.getenv("OPENAI_API_KEY")
 
@@ -21,19 +22,21 @@ def extract_student_info_from_image(image_url: str):
     Returns a JSON object with keys: full_name, student_id.
     """
 
-    # 1. Download the image locally using httpx (or requests)
+    # Local OCR first; GPT-4o vision only when the card can't be read with confidence
+    local = extract_student_info_locally(image_url)
+    if local:
+        return {**local, "success": True}
+
+    # 1. Get the image from the shared cache (downloaded once, reused by the biometric check)
     # We do this to avoid OpenAI 'Timeout' errors on large files
-    image_data = None
-    media_type = "image/jpeg"
-    
-    with httpx.Client() as client:
-        response = client.get(image_url, timeout=10.0)
-        if response.status_code != 200:
-            return f"Error: Could not download image. Status: {response.status_code}"
-        
-        # Get content type (e.g. image/png)
-        media_type = response.headers.get("content-type", "image/jpeg")
-        image_data = base64.b64encode(response.content).decode("utf-8")
+    try:
+        image = image_cache.fetch(image_url)
+        image_data = image_cache.artifact(image_url, "base64", lambda data: base64.b64encode(data).decode("utf-8"))
+    except ImageDownloadError as e:
+        return f"Error: {e}"
+
+    # Get content type (e.g. image/png)
+    media_type = image.media_type
 
     try:
         # We need to send the image to GPT-4o
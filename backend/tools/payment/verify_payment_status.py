@@ -2,7 +2,7 @@
 import os
 from langchain_core.tools import tool
 from datetime import datetime
-from utils.supabase_client import supabase
+from database.ledger import get_ledger
 
 @tool
 def verify_payment_status(student_id: str):
@@ -13,33 +13,17 @@ def verify_payment_status(student_id: str):
     print(f"🔎 Verifying payment for {student_id}...")
     
     try:
-        # 1. Look for the most recent SUCCESSFUL payment
-        payment_res = supabase.table("payments") \
-            .select("*") \
-            .eq("student_id", student_id) \
-            .eq("status", "paid") \
-            .order("created_at", desc=True) \
-            .limit(1) \
-            .execute()
+        # 1. Balance, due date and last payment come from the ledger in one lookup
+        ledger = get_ledger(student_id)
 
-        if not payment_res.data:
+        if not ledger or ledger.get('last_payment_amount') is None:
              return "❌ I cannot see the payment yet. Please wait a moment and try again."
 
-        payment = payment_res.data[0]
-        amount_paid = payment['amount']
-        current_balance = payment['balance_after'] # The webhook calculated this!
-        
-        # 2. Get the Due Date from Students Table
-        student_res = supabase.table("students") \
-            .select("next_payment_due") \
-            .eq("student_id", student_id) \
-            .execute()
-            
-        due_date = "2025-09-01" # Default fallback
-        if student_res.data and student_res.data[0]['next_payment_due']:
-            due_date = student_res.data[0]['next_payment_due']
+        amount_paid = float(ledger['last_payment_amount'])
+        current_balance = float(ledger['balance']) # The webhook keeps this up to date!
+        due_date = ledger.get('next_payment_due') or "2025-09-01" # Default fallback
 
-        # 3. Construct the Notification Message
+        # 2. Construct the Notification Message
         return (
             f"✅ **Payment Successful!**\n\n"
             f"We have received your payment of **£{amount_paid:,.2f}**.\n"
@@ -1,17 +1,16 @@
 from langchain_core.tools import tool
-from utils.supabase_client import supabase
+from database.student_registry import student_registry
 
 @tool
 def verify_student_identity(extracted_id: str):
     """
     Checks Supabase to see if the student exists.
     """
-    # Query Supabase
-    response = supabase.table("students").select("*").eq("student_id", extracted_id).execute()
-    print("response", response)
+    # Local registry copy; falls back to Supabase for students not replicated yet
+    student = student_registry.get_by_id(extracted_id)
+    print("student", student)
 
-    if response.data and len(response.data) > 0:
-        student = response.data[0]
+    if student:
         return f"Identity Verified: Name: {student['name']}, Course: {student['course']}, Year Admitted: {student['year_admitted']}"
     else:
         return "NOT_FOUND"
\ No newline at end of file
@@ -0,0 +1,39 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Rejects request bodies larger than `max_bytes` with a 413 before they are parsed,
+    so an oversized upload is never fully received or spooled to disk.
+    A declared Content-Length is checked up front; chunked bodies are counted as they arrive.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        detail = f"Request body is larger than {self.max_bytes // (1024 * 1024)} MB"
+        headers = dict(scope["headers"])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised from inside form parsing; FastAPI passes HTTPException through as-is
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,190 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage, SystemMessage
+
+load_dotenv()
+
+# Most recent turns (a student message plus everything that answered it) always sent verbatim
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+# Rough input budget for the conversation part of an agent prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+# How many rolling summaries we keep in memory
+SUMMARY_CACHE_SIZE = int(os.getenv("CONTEXT_SUMMARY_CACHE_SIZE", "512"))
+# Tool output is truncated to this many characters when fed to the summarizer
+SUMMARY_TOOL_CHARS = 500
+
+# State keys that are always repeated to the agent, however old the turn that set them
+FACT_KEYS = {
+    "student_id": "Student ID",
+    "student_name": "Student Name",
+    "file_url": "ID Card Upload URL",
+    "live_image_url": "Live Image URL",
+    "payment_link": "Payment Link",
+}
+
+api_key = os.getenv("OPENAI_API_KEY")
+summary_llm = ChatOpenAI(model="gpt-4o-mini", openai_api_key=api_key, temperature=0)
+
+SUMMARY_PROMPT = """
+You maintain the running summary of a conversation between a Northumbria University
+student and the university's assistant agents.
+Update the summary with the new messages. Keep every concrete fact (names, IDs, emails,
+dates, amounts, links, what was verified or booked, what the student still needs) and
+drop small talk. Answer with the updated summary only, in short bullet points.
+"""
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text, disallowed_special=()))
+except Exception:
+    # ~4 characters per token is close enough for budgeting
+    def count_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+
+def message_tokens(msg: BaseMessage) -> int:
+    content = msg.content if isinstance(msg.content, str) else json.dumps(msg.content, default=str)
+    tokens = count_tokens(content) + 4  # role / framing overhead
+    tool_calls = getattr(msg, "tool_calls", None)
+    if tool_calls:
+        tokens += count_tokens(json.dumps(tool_calls, default=str))
+    return tokens
+
+
+class SummaryCache:
+    """
+    LRU of rolling summaries, keyed by the id of the last message each summary covers.
+    A new summary only has to read the messages after the newest cached one.
+    """
+
+    def __init__(self, max_size: int = SUMMARY_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if not key:
+            return None
+        with self._lock:
+            summary = self._items.get(key)
+            if summary is not None:
+                self._items.move_to_end(key)
+            return summary
+
+    def put(self, key: Optional[str], summary: str):
+        if not key:
+            return
+        with self._lock:
+            self._items[key] = summary
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+summary_cache = SummaryCache()
+
+
+def split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups messages into turns, each starting at a HumanMessage"""
+    turns: List[List[BaseMessage]] = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage) or not turns:
+            turns.append([msg])
+        else:
+            turns[-1].append(msg)
+    return turns
+
+
+def facts_message(state: Dict[str, Any]) -> Optional[SystemMessage]:
+    facts = [f"- {label}: {state[key]}" for key, label in FACT_KEYS.items() if state.get(key)]
+    if not facts:
+        return None
+    return SystemMessage(content="[KNOWN FACTS FROM THIS CONVERSATION]\n" + "\n".join(facts))
+
+
+def render_for_summary(messages: List[BaseMessage]) -> str:
+    lines = []
+    for msg in messages:
+        content = msg.content if isinstance(msg.content, str) else str(msg.content)
+        if isinstance(msg, HumanMessage):
+            lines.append(f"Student: {content}")
+        elif isinstance(msg, ToolMessage):
+            lines.append(f"Tool ({msg.name}): {content[:SUMMARY_TOOL_CHARS]}")
+        elif isinstance(msg, AIMessage):
+            if content:
+                lines.append(f"Assistant: {content}")
+            for call in msg.tool_calls or []:
+                lines.append(f"Assistant called {call['name']}({json.dumps(call['args'], default=str)})")
+    return "\n".join(lines)
+
+
+def plan_window(messages: List[BaseMessage]) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+    """
+    Splits history into (older, recent). Everything fits -> nothing is summarized.
+    Otherwise the last CONTEXT_KEEP_TURNS turns stay verbatim (fewer if they alone
+    blow the budget, but never less than the current turn) and the rest is summarized.
+    """
+    if sum(message_tokens(m) for m in messages) <= CONTEXT_TOKEN_BUDGET:
+        return [], list(messages)
+
+    turns = split_turns(messages)
+    keep = max(1, min(CONTEXT_KEEP_TURNS, len(turns)))
+    recent_turns = turns[-keep:]
+    while len(recent_turns) > 1 and sum(message_tokens(m) for t in recent_turns for m in t) > CONTEXT_TOKEN_BUDGET:
+        recent_turns = recent_turns[1:]
+
+    older = [m for t in turns[:len(turns) - len(recent_turns)] for m in t]
+    recent = [m for t in recent_turns for m in t]
+    return older, recent
+
+
+def _pending_summary(older: List[BaseMessage]) -> Tuple[Optional[str], List[BaseMessage]]:
+    """Newest cached summary covering a prefix of `older`, plus the messages it doesn't cover"""
+    for i in range(len(older) - 1, -1, -1):
+        cached = summary_cache.get(getattr(older[i], "id", None))
+        if cached is not None:
+            return cached, older[i + 1:]
+    return None, older
+
+
+def _summary_request(previous: Optional[str], new_messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": (
+            f"CURRENT SUMMARY:\n{previous or '(empty)'}\n\n"
+            f"NEW MESSAGES:\n{render_for_summary(new_messages)}"
+        )},
+    ]
+
+
+def _assemble(system_message: SystemMessage, state: Dict[str, Any], summary: Optional[str], recent: List[BaseMessage]) -> List[BaseMessage]:
+    context: List[BaseMessage] = [system_message]
+    facts = facts_message(state)
+    if facts:
+        context.append(facts)
+    if summary:
+        context.append(SystemMessage(content=f"[SUMMARY OF EARLIER CONVERSATION]\n{summary}"))
+    return context + recent
+
+
+async def abuild_agent_context(system_message: SystemMessage, state: Dict[str, Any]) -> List[BaseMessage]:
+    """
+    Returns the prompt for an agent: system message, known facts, a rolling
+    summary of older turns, then the recent turns verbatim.
+    """
+    older, recent = plan_window(state["messages"])
+    summary = None
+    if older:
+        summary, uncovered = _pending_summary(older)
+        if uncovered:
+            summary = (await summary_llm.ainvoke(_summary_request(summary, uncovered))).content
+            summary_cache.put(getattr(older[-1], "id", None), summary)
+    return _assemble(system_message, state, summary, recent)
@@ -1,9 +1,18 @@
 from datetime import datetime, timedelta
+
+# Days (including today) students can book into; the availability index covers the same range
+BOOKING_HORIZON_DAYS = 15
+
+def get_booking_dates():
+    """The YYYY-MM-DD dates of the booking horizon, starting today"""
+    now = datetime.now()
+    return [(now + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(BOOKING_HORIZON_DAYS)]
+
 def get_date_cheat_sheet():
     """Generates a text list of the next 14 days for the LLM"""
     now = datetime.now()
     cheat_sheet = "**CALENDAR REFERENCE (Use this to find dates):**\n"
-    for i in range(15):
+    for i in range(BOOKING_HORIZON_DAYS):
         day = now + timedelta(days=i)
         # Format: "Wednesday, Dec 17"
         cheat_sheet += f"- +{i} days ({day.strftime('%A')}): {day.strftime('%Y-%m-%d')}\n"
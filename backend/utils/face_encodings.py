@@ -0,0 +1,90 @@
+import os
+import time
+from io import BytesIO
+from typing import List
+import numpy as np
+import face_recognition
+from utils.image_cache import image_cache
+
+# ID-card faceprints, one .npy per image content hash, shared by every worker process
+FACE_ENCODINGS_DIR = os.getenv("FACE_ENCODINGS_DIR", "face_encodings")
+# Faceprints are biometric data: keep them only as long as a verification may still be retried
+FACE_ENCODINGS_TTL_SECONDS = int(os.getenv("FACE_ENCODINGS_TTL_SECONDS", str(24 * 3600)))
+SWEEP_INTERVAL_SECONDS = 600
+
+_last_sweep = 0.0
+
+
+def _encodings_path(digest: str) -> str:
+    return os.path.join(FACE_ENCODINGS_DIR, f"{digest}.npy")
+
+
+def sweep_encodings(ttl: int = FACE_ENCODINGS_TTL_SECONDS) -> int:
+    """Deletes stored faceprints unused for `ttl` seconds. Returns files removed."""
+    global _last_sweep
+    _last_sweep = time.time()
+    removed = 0
+    try:
+        names = os.listdir(FACE_ENCODINGS_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(FACE_ENCODINGS_DIR, name)
+        try:
+            if os.stat(path).st_mtime < time.time() - ttl:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def decoded_image(url: str) -> np.ndarray:
+    """RGB array of the image at `url`, decoded once and shared with the other vision tools"""
+    return image_cache.artifact(url, "rgb", lambda data: face_recognition.load_image_file(BytesIO(data)))
+
+
+def _load_or_compute(digest: str, url: str) -> List[np.ndarray]:
+    path = _encodings_path(digest)
+    try:
+        encodings = list(np.load(path))
+        os.utime(path)
+        return encodings
+    except (OSError, ValueError):
+        pass
+
+    encodings = face_recognition.face_encodings(decoded_image(url))
+    try:
+        os.makedirs(FACE_ENCODINGS_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, np.array(encodings, dtype=np.float64).reshape(-1, 128))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not store face encodings: {e}")
+    if time.time() - _last_sweep > SWEEP_INTERVAL_SECONDS:
+        sweep_encodings()
+    return encodings
+
+
+def id_card_encodings(url: str) -> List[np.ndarray]:
+    """
+    Faceprints found on the ID card at `url`. Computed once per card image (keyed by
+    its content hash) and reused by every later biometric check, including retries.
+    """
+    digest = image_cache.fetch(url).digest
+    return image_cache.artifact(url, "face_encodings", lambda _: _load_or_compute(digest, url))
+
+
+def precompute_id_card_encodings(url: str) -> int:
+    """Warms the store right after the card is read, so the selfie check only encodes the selfie"""
+    encodings = id_card_encodings(url)
+    print(f"🧬 ID card faceprints ready: {len(encodings)} face(s)")
+    return len(encodings)
+
+
+def forget_id_card_encodings(url: str):
+    """Deletes the card's stored faceprints once they have served their verification"""
+    try:
+        os.remove(_encodings_path(image_cache.fetch(url).digest))
+    except OSError:
+        pass
@@ -0,0 +1,267 @@
+import os
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+import httpx
+
+# Memory held by downloaded images and everything decoded from them, per process
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Raw bytes are also kept on disk so tool worker processes share one download. Empty disables it.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_DISK_MAX_BYTES = int(os.getenv("IMAGE_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+# ID cards and selfies are only needed while the student is being verified; older copies are deleted
+IMAGE_CACHE_TTL_SECONDS = int(os.getenv("IMAGE_CACHE_TTL_SECONDS", str(24 * 3600)))
+# URL -> content hash entries kept, in memory and on disk
+IMAGE_CACHE_MAX_URLS = int(os.getenv("IMAGE_CACHE_MAX_URLS", "10000"))
+DOWNLOAD_TIMEOUT_SECONDS = 10.0
+DISK_TRIM_INTERVAL_SECONDS = 60
+
+
+class ImageDownloadError(Exception):
+    pass
+
+
+def _size_of(value: Any) -> int:
+    nbytes = getattr(value, "nbytes", None)   # numpy arrays
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_size_of(v) for v in value)
+    return sys.getsizeof(value)
+
+
+@dataclass
+class CachedImage:
+    digest: str          # sha256 of the content
+    data: bytes
+    media_type: str
+    artifacts: Dict[str, Any] = field(default_factory=dict)
+    size: int = 0
+
+
+class ImageCache:
+    """
+    Content-addressed cache for uploaded images. URLs map to a content hash; each
+    hash holds the raw bytes plus anything derived from them (base64, decoded
+    arrays, ...), so every vision tool downloads and decodes an image only once.
+    """
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_MAX_BYTES, directory: Optional[str] = IMAGE_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._urls: "OrderedDict[str, str]" = OrderedDict()
+        self._images: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._last_disk_trim = 0.0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "downloads": 0, "artifact_hits": 0, "artifact_builds": 0, "evictions": 0}
+        if directory:
+            os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+            os.makedirs(os.path.join(directory, "urls"), exist_ok=True)
+
+    # --- memory tier ---
+
+    def _touch(self, digest: str) -> Optional[CachedImage]:
+        image = self._images.get(digest)
+        if image is not None:
+            self._images.move_to_end(digest)
+        return image
+
+    def _account(self, image: CachedImage, added: int):
+        image.size += added
+        self._bytes += added
+        # Least recently used images go first, but never the one being filled in
+        while self._bytes > self.max_bytes and len(self._images) > 1:
+            digest, old = next(iter(self._images.items()))
+            if old is image:
+                break
+            del self._images[digest]
+            self._bytes -= old.size
+            self.stats["evictions"] += 1
+
+    def _remember(self, url: str, data: bytes, media_type: str) -> CachedImage:
+        digest = hashlib.sha256(data).hexdigest()
+        self._urls[url] = digest
+        self._urls.move_to_end(url)
+        while len(self._urls) > IMAGE_CACHE_MAX_URLS:
+            self._urls.popitem(last=False)
+        image = self._touch(digest)
+        if image is None:
+            image = CachedImage(digest=digest, data=data, media_type=media_type)
+            self._images[digest] = image
+            self._account(image, len(data))
+        return image
+
+    # --- disk tier ---
+
+    def _url_path(self, url: str) -> str:
+        return os.path.join(self.directory, "urls", hashlib.sha256(url.encode()).hexdigest())
+
+    def _read_disk(self, url: str) -> Optional[tuple]:
+        if not self.directory:
+            return None
+        try:
+            url_path = self._url_path(url)
+            with open(url_path) as f:
+                digest, media_type = f.read().split(" ", 1)
+            blob = os.path.join(self.directory, "blobs", digest)
+            with open(blob, "rb") as f:
+                data = f.read()
+            # Recently used entries are the last to be trimmed
+            os.utime(url_path)
+            os.utime(blob)
+            return data, media_type
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, url: str, image: CachedImage):
+        if not self.directory:
+            return
+        try:
+            blob = os.path.join(self.directory, "blobs", image.digest)
+            if not os.path.exists(blob):
+                tmp = f"{blob}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(image.data)
+                os.replace(tmp, blob)
+            else:
+                os.utime(blob)
+            tmp = f"{self._url_path(url)}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(f"{image.digest} {image.media_type}")
+            os.replace(tmp, self._url_path(url))
+            self._trim_disk()
+        except OSError as e:
+            print(f"Could not write image cache: {e}")
+
+    def _scan(self, subdir: str) -> list:
+        """(mtime, size, path) of every file under `subdir`, oldest first"""
+        folder = os.path.join(self.directory, subdir)
+        entries = []
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            try:
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        return sorted(entries)
+
+    def _trim_disk(self):
+        """
+        Deletes blobs and URL entries unused for IMAGE_CACHE_TTL_SECONDS, then the oldest
+        blobs past IMAGE_CACHE_DISK_MAX_BYTES and the oldest URL entries past IMAGE_CACHE_MAX_URLS
+        """
+        if time.time() - self._last_disk_trim < DISK_TRIM_INTERVAL_SECONDS:
+            return
+        self._last_disk_trim = time.time()
+        expired_before = time.time() - IMAGE_CACHE_TTL_SECONDS
+
+        blobs = self._scan("blobs")
+        total = sum(size for _, size, _ in blobs)
+        for mtime, size, path in blobs:
+            if mtime >= expired_before and total <= IMAGE_CACHE_DISK_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+        urls = self._scan("urls")
+        count = len(urls)
+        for mtime, _, path in urls:
+            if mtime >= expired_before and count <= IMAGE_CACHE_MAX_URLS:
+                break
+            try:
+                os.remove(path)
+                count -= 1
+            except OSError:
+                pass
+        # URL entries pointing at removed blobs just miss and re-download
+
+    # --- public API ---
+
+    def put(self, url: str, data: bytes, media_type: str = "image/jpeg"):
+        """Seeds the cache with bytes we already have, e.g. right after uploading them"""
+        with self._lock:
+            image = self._remember(url, data, media_type)
+        self._write_disk(url, image)
+
+    def fetch(self, url: str) -> CachedImage:
+        """The image behind `url`, downloaded at most once per process (and once per node with the disk tier)"""
+        with self._lock:
+            digest = self._urls.get(url)
+            image = self._touch(digest) if digest else None
+            if image is not None:
+                self.stats["memory_hits"] += 1
+                return image
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+
+        # One download per URL even when several tools ask at once
+        try:
+            with url_lock:
+                with self._lock:
+                    digest = self._urls.get(url)
+                    image = self._touch(digest) if digest else None
+                    if image is not None:
+                        self.stats["memory_hits"] += 1
+                        return image
+
+                from_disk = self._read_disk(url)
+                if from_disk is not None:
+                    with self._lock:
+                        self.stats["disk_hits"] += 1
+                        return self._remember(url, *from_disk)
+
+                try:
+                    response = httpx.get(url, timeout=DOWNLOAD_TIMEOUT_SECONDS, follow_redirects=True)
+                except httpx.HTTPError as e:
+                    raise ImageDownloadError(f"Could not download image: {e}")
+                if response.status_code != 200:
+                    raise ImageDownloadError(f"Could not download image. Status: {response.status_code}")
+
+                with self._lock:
+                    self.stats["downloads"] += 1
+                    image = self._remember(url, response.content, response.headers.get("content-type", "image/jpeg"))
+                self._write_disk(url, image)
+                return image
+        finally:
+            # Dropped on success and failure alike; waiters still hold their reference
+            with self._lock:
+                if self._url_locks.get(url) is url_lock:
+                    del self._url_locks[url]
+
+    def artifact(self, url: str, name: str, build: Callable[[bytes], Any]) -> Any:
+        """
+        Something derived from the image at `url` (a decoded array, an encoding...),
+        built by `build(raw_bytes)` the first time it is asked for and reused after.
+        """
+        image = self.fetch(url)
+        with self._lock:
+            if name in image.artifacts:
+                self.stats["artifact_hits"] += 1
+                return image.artifacts[name]
+        value = build(image.data)
+        with self._lock:
+            if name not in image.artifacts:
+                image.artifacts[name] = value
+                self.stats["artifact_builds"] += 1
+                if image.digest in self._images:
+                    self._account(image, _size_of(value))
+            return image.artifacts[name]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "images": len(self._images), "memory_bytes": self._bytes}
+
+
+# Shared instance used by the vision tools (one per process)
+image_cache = ImageCache()
@@ -0,0 +1,55 @@
+import io
+import os
+from typing import BinaryIO, Optional, Union
+from PIL import Image, ImageOps, UnidentifiedImageError
+from PIL.Image import DecompressionBombError
+
+# Longest side kept for ID cards and selfies; OCR and face matching gain nothing above this
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1600"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+
+def normalize_image(path: Union[str, BinaryIO], max_side: int = IMAGE_MAX_SIDE) -> Optional[bytes]:
+    """
+    Upright, downsized JPEG version of the image at `path` (or in an open binary file):
+    EXIF rotation is applied,
+    the longest side is capped at `max_side` and metadata is dropped.
+    Returns None when the file is not an image we can read. Raises DecompressionBombError
+    when its pixel count is far beyond anything a camera produces.
+    """
+    try:
+        with Image.open(path) as img:
+            # JPEG decoders can skip straight to a smaller scale, saving most of the decode work
+            img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGB")
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+            return out.getvalue()
+    except (UnidentifiedImageError, OSError) as e:
+        print(f"Image normalization skipped: {e}")
+        return None
+
+
+def perceptual_hash(path: Union[str, BinaryIO], size: int = 16) -> Optional[int]:
+    """
+    Difference hash of the upright image: size*size bits recording whether each pixel
+    of a small greyscale thumbnail is brighter than its right-hand neighbour.
+    Re-encoded, resized or slightly re-cropped copies of a photo land a few bits apart.
+    Raises DecompressionBombError like normalize_image.
+    """
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (size * 8, size * 8))
+            img = ImageOps.exif_transpose(img).convert("L").resize((size + 1, size), Image.LANCZOS)
+            pixels = list(img.getdata())
+    except (UnidentifiedImageError, OSError):
+        return None
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
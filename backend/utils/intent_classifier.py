@@ -0,0 +1,231 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# Every route the LLM orchestrator decides on is appended here, so the
+# local model keeps learning from real traffic.
+ROUTE_LOG_PATH = os.getenv("ROUTE_LOG_PATH", "route_log.jsonl")
+
+# How sure the local classifier must be before we skip the LLM call
+CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+# Gap required between the best and second best intent
+CONFIDENCE_MARGIN = float(os.getenv("INTENT_CONFIDENCE_MARGIN", "0.2"))
+# Don't trust the TF-IDF model for an intent until it has seen this many examples
+MIN_EXAMPLES_PER_INTENT = 5
+# Rebuild the model after this many newly logged routes
+RETRAIN_EVERY = 25
+# Most recent examples kept per intent; older ones are dropped from memory and from the log
+MAX_EXAMPLES_PER_INTENT = int(os.getenv("INTENT_MAX_EXAMPLES_PER_INTENT", "500"))
+# Replies shorter than this ("yes", "Monday", an email) only mean something next to the
+# question the assistant just asked, so they are neither fast-pathed nor learned from
+MIN_CONTEXT_FREE_TOKENS = 3
+
+# Phrases that are unambiguous on their own. If a message only hits one
+# intent's keywords we route it without asking the LLM.
+INTENT_KEYWORDS = {
+    "payment": [
+        "pay", "payment", "fees", "fee", "tuition", "invoice", "stripe",
+        "payment link", "balance", "instalment", "installment", "student id card",
+    ],
+    "appointment": [
+        "appointment", "book a meeting", "schedule", "meet someone", "meeting",
+        "talk to someone", "speak to someone", "in person", "book a slot",
+    ],
+    "info": [
+        "library", "opening hours", "gym", "student union", "campus", "event",
+        "events", "tfl", "course", "courses", "term dates", "accommodation",
+    ],
+}
+
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "to", "for", "of", "and", "or", "is",
+    "are", "be", "can", "you", "please", "want", "would", "like", "do", "it",
+    "on", "in", "at", "with", "what", "how", "when", "where", "this", "that",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# Identifiers never written to the route log: emails, links and ids / phone numbers
+REDACTIONS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<email>"),
+    (re.compile(r"https?://\S+"), "<url>"),
+    (re.compile(r"\+?\d[\d\s-]{4,}\d"), "<number>"),
+]
+
+
+def redact(text: str) -> str:
+    for pattern, placeholder in REDACTIONS:
+        text = pattern.sub(placeholder, text)
+    return text
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class IntentClassifier:
+    """
+    Cheap local router that sits in front of the orchestrator LLM.
+    Keyword rules handle the obvious messages; a TF-IDF centroid model trained
+    on logged routes handles the rest. Returns None when unsure, and for short
+    replies to the assistant, which only the LLM (seeing the question) can route.
+    """
+
+    def __init__(self, log_path: str = ROUTE_LOG_PATH):
+        self.log_path = log_path
+        self.examples: List[Tuple[str, str]] = []
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._load_log()
+        self.train()
+
+    def _load_log(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "r") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    self.examples.append((redact(row["text"]), row["agent"]))
+                except (ValueError, KeyError):
+                    continue
+        # Logs written before redaction and capping are rewritten in the new form
+        self._cap_examples()
+        with self._lock:
+            self._rewrite_log()
+
+    def _cap_examples(self) -> bool:
+        """Keeps the newest MAX_EXAMPLES_PER_INTENT examples of each intent. Returns True if any were dropped."""
+        seen: Counter = Counter()
+        kept = []
+        for text, agent in reversed(self.examples):
+            seen[agent] += 1
+            if seen[agent] <= MAX_EXAMPLES_PER_INTENT:
+                kept.append((text, agent))
+        dropped = len(kept) != len(self.examples)
+        self.examples = kept[::-1]
+        return dropped
+
+    def _rewrite_log(self):
+        tmp = f"{self.log_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                for text, agent in self.examples:
+                    f.write(json.dumps({"text": text, "agent": agent}) + "\n")
+            os.replace(tmp, self.log_path)
+        except OSError as e:
+            print(f"Could not rewrite route log: {e}")
+
+    @staticmethod
+    def depends_on_context(text: str, has_context: bool) -> bool:
+        """True for short replies to something the assistant asked"""
+        return has_context and len(tokenize(redact(text))) < MIN_CONTEXT_FREE_TOKENS
+
+    def _vectorize(self, tokens: List[str]) -> Dict[str, float]:
+        counts = Counter(tokens)
+        vec = {t: c * self.idf[t] for t, c in counts.items() if t in self.idf}
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        return {t: v / norm for t, v in vec.items()} if norm else {}
+
+    def train(self):
+        """Rebuilds IDF weights and one centroid vector per intent."""
+        with self._lock:
+            if self._cap_examples():
+                self._rewrite_log()
+            docs = [(tokenize(text), agent) for text, agent in self.examples]
+            per_intent = Counter(agent for _, agent in docs)
+
+            df = Counter()
+            for tokens, _ in docs:
+                df.update(set(tokens))
+            n = len(docs)
+            self.idf = {t: math.log((1 + n) / (1 + c)) + 1 for t, c in df.items()}
+
+            sums: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+            for tokens, agent in docs:
+                if per_intent[agent] < MIN_EXAMPLES_PER_INTENT:
+                    continue
+                for t, v in self._vectorize(tokens).items():
+                    sums[agent][t] += v
+
+            centroids = {}
+            for agent, vec in sums.items():
+                norm = math.sqrt(sum(v * v for v in vec.values()))
+                if norm:
+                    centroids[agent] = {t: v / norm for t, v in vec.items()}
+            self.centroids = centroids
+            self._pending = 0
+
+    def _keyword_route(self, text: str) -> Optional[str]:
+        lowered = f" {' '.join(TOKEN_RE.findall(text.lower()))} "
+        hits = {
+            agent for agent, words in INTENT_KEYWORDS.items()
+            if any(f" {w} " in lowered for w in words)
+        }
+        # Only trust keywords when they point at exactly one intent
+        return hits.pop() if len(hits) == 1 else None
+
+    def _model_route(self, text: str) -> Optional[Tuple[str, float]]:
+        if not self.centroids:
+            return None
+        vec = self._vectorize(tokenize(text))
+        if not vec:
+            return None
+        scores = sorted(
+            ((sum(v * centroid.get(t, 0.0) for t, v in vec.items()), agent)
+             for agent, centroid in self.centroids.items()),
+            reverse=True,
+        )
+        best_score, best_agent = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score >= CONFIDENCE_THRESHOLD and best_score - runner_up >= CONFIDENCE_MARGIN:
+            return best_agent, best_score
+        return None
+
+    def classify(self, text: str, has_context: bool = False) -> Optional[str]:
+        """
+        Returns an agent key when confident, otherwise None (ask the LLM).
+        `has_context` says the assistant has spoken before this message.
+        """
+        if not text or not text.strip() or self.depends_on_context(text, has_context):
+            return None
+
+        agent = self._keyword_route(text)
+        if agent:
+            print(f"⚡ Fast-path (keywords): {agent}")
+            return agent
+
+        match = self._model_route(text)
+        if match:
+            print(f"⚡ Fast-path (tf-idf {match[1]:.2f}): {match[0]}")
+            return match[0]
+
+        return None
+
+    def record(self, text: str, agent: str, has_context: bool = False):
+        """Logs an LLM routing decision, identifiers redacted, so the local model can learn from it."""
+        if not text or not text.strip() or self.depends_on_context(text, has_context):
+            return
+        text = redact(text)
+        with self._lock:
+            self.examples.append((text, agent))
+            self._pending += 1
+            try:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps({"text": text, "agent": agent}) + "\n")
+            except OSError as e:
+                print(f"Could not write route log: {e}")
+            should_retrain = self._pending >= RETRAIN_EVERY
+
+        if should_retrain:
+            self.train()
+
+
+# Shared instance used by the orchestrator
+intent_classifier = IntentClassifier()
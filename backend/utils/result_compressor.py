@@ -0,0 +1,125 @@
+import os
+import re
+import math
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+from utils.search_terms import tokenize
+from utils.context_window import count_tokens
+
+# Most search text the info agent gets to see per tool call
+SEARCH_CONTEXT_TOKEN_BUDGET = int(os.getenv("SEARCH_CONTEXT_TOKEN_BUDGET", "1200"))
+# Passages are built from sentences up to roughly this many words
+PASSAGE_WORDS = 80
+# Passages sharing this much of their vocabulary with a kept one are dropped
+DUPLICATE_OVERLAP = 0.7
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_passages(text: str) -> List[str]:
+    """Groups sentences into passages of about PASSAGE_WORDS words"""
+    passages, current, words = [], [], 0
+    for sentence in SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current.append(sentence)
+        words += len(sentence.split())
+        if words >= PASSAGE_WORDS:
+            passages.append(" ".join(current))
+            current, words = [], 0
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def _score(query_terms: List[str], passages: List[List[str]]) -> List[float]:
+    """BM25 of each passage against the query, using the passages themselves as the corpus"""
+    n = len(passages)
+    if not n:
+        return []
+    avg_length = sum(len(p) for p in passages) / n or 1.0
+    df = Counter(t for p in passages for t in set(p))
+    scores = []
+    for tokens in passages:
+        counts = Counter(tokens)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * 2.5 / (tf + 1.5 * (0.25 + 0.75 * len(tokens) / avg_length))
+        scores.append(score)
+    return scores
+
+
+def _is_duplicate(tokens: set, kept: List[set]) -> bool:
+    for other in kept:
+        smaller = min(len(tokens), len(other)) or 1
+        if len(tokens & other) / smaller >= DUPLICATE_OVERLAP:
+            return True
+    return False
+
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    """Longest word prefix of `text` that fits in `budget` tokens, marked with an ellipsis"""
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:mid]) + " …") <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low]) + " …" if low else ""
+
+
+def compress_results(query: str, results: List[Dict[str, Any]], budget: int = SEARCH_CONTEXT_TOKEN_BUDGET) -> List[Dict[str, Any]]:
+    """
+    Keeps only the passages of the search results that best match the query, without
+    near-duplicates and within `budget` tokens. Returns results in their original
+    order with the surviving passages as content; results left with nothing are dropped.
+    """
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    candidates: List[Tuple[int, int, str, List[str]]] = []   # (result, position, text, tokens)
+    for r, res in enumerate(results):
+        for position, passage in enumerate(split_passages(res.get("content") or "")):
+            candidates.append((r, position, passage, tokenize(passage)))
+
+    scores = _score(query_terms, [c[3] for c in candidates])
+    # Best first; ties keep the search engine's ranking
+    ranked = sorted(range(len(candidates)), key=lambda i: (-scores[i], candidates[i][0], candidates[i][1]))
+    # Passages that share no words with the query only get in when nothing else matched
+    if any(scores):
+        ranked = [i for i in ranked if scores[i] > 0]
+
+    kept: Dict[int, List[Tuple[int, str]]] = {}
+    kept_tokens: List[set] = []
+    used = 0
+    for i in ranked:
+        r, position, passage, tokens = candidates[i]
+        cost = count_tokens(passage)
+        if used + cost > budget:
+            continue
+        token_set = set(tokens)
+        if _is_duplicate(token_set, kept_tokens):
+            continue
+        kept.setdefault(r, []).append((position, passage))
+        kept_tokens.append(token_set)
+        used += cost
+
+    # Even the best passage is over budget on its own (e.g. a page with no sentence breaks):
+    # send its opening rather than nothing at all
+    if not kept and ranked:
+        r, position, passage, _ = candidates[ranked[0]]
+        cut = truncate_to_budget(passage, budget)
+        if cut:
+            kept[r] = [(position, cut)]
+
+    compressed = []
+    for r, res in enumerate(results):
+        if r in kept:
+            passages = [p for _, p in sorted(kept[r])]
+            compressed.append({**res, "content": " … ".join(passages)})
+    return compressed
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Entries kept in memory before the least recently used one is dropped
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+# Optional disk tier shared by workers and kept across restarts. Empty disables it.
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite")
+SEARCH_CACHE_DISK_MAX = int(os.getenv("SEARCH_CACHE_DISK_MAX", "20000"))
+DEFAULT_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Pages that change often get a shorter lifetime. A cached search lives as long
+# as the most volatile domain among its results allows.
+DOMAIN_TTL_SECONDS = {
+    "northumbria.native.fm": 3600,        # events calendar
+    "store.northumbria.ac.uk": 3600,      # ticketed trips and workshops
+    "mynsu.co.uk": 6 * 3600,
+    "linkedin.com": 24 * 3600,
+    "northumbria.ac.uk": 24 * 3600,
+}
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    'When is the Library open? ' and 'when is the  library open' map to the same key.
+    Only case, spacing and trailing punctuation are folded: question words and word
+    order decide what the search returns, so 'when' and 'where' stay distinct keys.
+    """
+    return WHITESPACE_RE.sub(" ", query.lower()).strip().rstrip("?!. ")
+
+
+def ttl_for_results(results: List[Dict[str, Any]]) -> int:
+    ttl = DEFAULT_TTL_SECONDS
+    for res in results:
+        host = urlparse(res.get("url", "")).netloc.lower()
+        for domain, domain_ttl in DOMAIN_TTL_SECONDS.items():
+            if host == domain or host.endswith("." + domain):
+                ttl = min(ttl, domain_ttl)
+                break
+    return ttl
+
+
+class SearchCache:
+    """
+    Two-tier cache for search results: an in-memory LRU in front of an optional
+    sqlite file. Keys are normalized queries; entries expire per domain TTL.
+    """
+
+    def __init__(self, max_size: int = SEARCH_CACHE_SIZE, path: Optional[str] = SEARCH_CACHE_PATH):
+        self.max_size = max_size
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS search_cache "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Search cache disk tier disabled: {e}")
+                self._db = None
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            if entry:
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM search_cache WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.stats["disk_hits"] += 1
+                    return value
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: Any, ttl: int):
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.stats["stores"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO search_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), expires_at),
+                    )
+                    # Keep the file bounded: drop expired rows, then the soonest to expire
+                    self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+                    self._db.execute(
+                        "DELETE FROM search_cache WHERE key IN (SELECT key FROM search_cache "
+                        "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                        (SEARCH_CACHE_DISK_MAX,),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Could not write search cache: {e}")
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drops one normalized key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+            else:
+                self._memory.pop(key, None)
+            if self._db is not None:
+                if key is None:
+                    self._db.execute("DELETE FROM search_cache")
+                else:
+                    self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+
+# Shared instance used by the info search tool
+search_cache = SearchCache()
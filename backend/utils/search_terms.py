@@ -0,0 +1,14 @@
+import re
+from typing import List
+
+# Words too common to tell passages apart, shared by the knowledge index and the result compressor
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "to", "for", "of", "and", "or", "is",
+    "are", "be", "can", "you", "please", "do", "it", "on", "in", "at", "with",
+    "what", "how", "when", "where", "this", "that", "from", "by", "as", "your",
+}
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
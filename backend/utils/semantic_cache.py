@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+
+load_dotenv()
+
+# Cosine similarity a new question needs to reuse a stored answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(6 * 3600)))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+
+api_key = os.getenv("OPENAI_API_KEY")
+embeddings = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=api_key)
+
+
+class SemanticAnswerCache:
+    """
+    Stores generated answers keyed by the embedding of the question that produced them.
+    A new question close enough to a stored one gets the stored answer back.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: int = SEMANTIC_CACHE_TTL_SECONDS, max_size: int = SEMANTIC_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: List[Dict[str, Any]] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+    async def embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(await embeddings.aembed_query(text.strip().lower()), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, keep: List[int]):
+        self.entries = [self.entries[i] for i in keep]
+        self.vectors = self.vectors[keep] if keep else np.zeros((0, self.vectors.shape[1] if self.vectors.size else 0), dtype=np.float32)
+
+    def _expire(self):
+        now = time.time()
+        keep = [i for i, e in enumerate(self.entries) if e["expires_at"] > now]
+        if len(keep) != len(self.entries):
+            self._drop(keep)
+
+    def lookup(self, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Best stored answer above the similarity threshold, or None"""
+        with self._lock:
+            self._expire()
+            if not self.entries:
+                self.stats["misses"] += 1
+                return None
+            scores = self.vectors @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return {**self.entries[best], "similarity": float(scores[best])}
+
+    def store(self, vector: np.ndarray, question: str, answer: str, sources: List[str]):
+        with self._lock:
+            self._expire()
+            # Oldest entries go first when full
+            if len(self.entries) >= self.max_size:
+                self._drop(list(range(len(self.entries) - self.max_size + 1, len(self.entries))))
+            entry = {
+                "question": question,
+                "answer": answer,
+                "sources": sources,
+                "expires_at": time.time() + self.ttl,
+            }
+            self.entries.append(entry)
+            self.vectors = vector[None, :] if not self.vectors.size else np.vstack([self.vectors, vector])
+            self.stats["stores"] += 1
+
+    def invalidate(self, source: Optional[str] = None, question: Optional[str] = None) -> int:
+        """Drops answers citing `source`, answers to exactly `question`, or everything when neither is given"""
+        with self._lock:
+            before = len(self.entries)
+            if source is None and question is None:
+                keep = []
+            else:
+                keep = [
+                    i for i, e in enumerate(self.entries)
+                    if not ((source and any(source in s for s in e["sources"]))
+                            or (question and e["question"].strip().lower() == question.strip().lower()))
+                ]
+            self._drop(keep)
+            removed = before - len(self.entries)
+            self.stats["invalidations"] += removed
+            return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self.entries),
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "threshold": self.threshold,
+            }
+
+
+# Shared instance used by the info agent
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+
+def merge_intervals(intervals: Iterable[Interval], buffer: timedelta = timedelta(0)) -> List[Interval]:
+    """Sorts, pads each interval by `buffer` on both sides and merges overlaps"""
+    merged: List[Interval] = []
+    for start, end in sorted((s - buffer, e + buffer) for s, e in intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(window: Interval, busy: List[Interval]) -> List[Interval]:
+    """Free gaps of `window` left after removing merged, sorted `busy` intervals"""
+    free: List[Interval] = []
+    cursor, window_end = window
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start > cursor:
+            free.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < window_end:
+        free.append((cursor, window_end))
+    return free
+
+
+def _align(moment: datetime, origin: datetime, step: timedelta) -> datetime:
+    """Rounds `moment` up to the next step boundary counted from `origin`"""
+    offset = moment - origin
+    remainder = offset % step
+    return moment if not remainder else moment + (step - remainder)
+
+
+def free_slots(
+    window: Interval,
+    busy: Iterable[Interval],
+    slot: timedelta,
+    buffer: timedelta = timedelta(0),
+    step: Optional[timedelta] = None,
+    not_before: Optional[datetime] = None,
+) -> List[Interval]:
+    """
+    Concrete slots of length `slot` inside `window` that keep `buffer` clear of every busy interval.
+    Slot starts snap to `step` boundaries (default: the slot length) counted from the window start.
+    """
+    step = step or slot
+    if slot <= timedelta(0) or step <= timedelta(0):
+        raise ValueError("slot and step must be positive")
+    window_start, window_end = window
+    if not_before and not_before > window_start:
+        window_start = min(_align(not_before, window[0], step), window_end)
+
+    slots: List[Interval] = []
+    for gap_start, gap_end in subtract_intervals((window_start, window_end), merge_intervals(busy, buffer)):
+        start = _align(gap_start, window[0], step)
+        while start + slot <= gap_end:
+            slots.append((start, start + slot))
+            start += slot
+    return slots
+
+
+def date_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def free_slots_by_day(
+    days: Iterable[date],
+    day_window,
+    busy: Iterable[Interval],
+    slot: timedelta,
+    buffer: timedelta = timedelta(0),
+    step: Optional[timedelta] = None,
+    working_days: Iterable[int] = range(5),
+    not_before: Optional[datetime] = None,
+) -> Dict[date, List[Interval]]:
+    """
+    Runs free_slots for each working day. `day_window(day)` returns that day's working hours;
+    weekdays are numbered like date.weekday() (Monday is 0).
+    """
+    busy = merge_intervals(busy)
+    working_days = set(working_days)
+    result: Dict[date, List[Interval]] = {}
+    for day in days:
+        if day.weekday() not in working_days:
+            result[day] = []
+            continue
+        window = day_window(day)
+        day_busy = [(s, e) for s, e in busy if s < window[1] + buffer and e > window[0] - buffer]
+        result[day] = free_slots(window, day_busy, slot, buffer, step, not_before)
+    return result
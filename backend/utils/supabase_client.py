@@ -1,10 +1,119 @@
 import os
-from supabase import create_client
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from supabase import create_client, acreate_client, AsyncClient
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Most Supabase calls in flight at once; the rest wait for a free connection
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
 
+# Blocking client, used only when no event loop is serving (scripts, tests)
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+_async_client: Optional[AsyncClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _record(label: str, started: float, outcome: str):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        entry = _stats.setdefault(label, {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+        entry["calls"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        if outcome != "ok":
+            entry[outcome] += 1
+
+
+async def open_supabase():
+    """Creates the shared async client on the serving loop. Call on app startup."""
+    global _async_client, _loop, _slots
+    _async_client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    _loop = asyncio.get_running_loop()
+    _slots = asyncio.Semaphore(SUPABASE_MAX_CONNECTIONS)
+    print(f"🗄️ Supabase async client ready (max {SUPABASE_MAX_CONNECTIONS} concurrent calls)")
+
+
+async def close_supabase():
+    global _async_client, _loop
+    client, _async_client, _loop = _async_client, None, None
+    if client is not None:
+        try:
+            await client.postgrest.aclose()
+        except Exception as e:
+            print(f"Supabase client close failed: {e}")
+
+
+async def db_call(label: str, operation: Callable[[Any], Awaitable[Any]]) -> Any:
+    """
+    Runs `operation(client)` on the shared async client, bounded by the connection
+    limit and SUPABASE_TIMEOUT_SECONDS, and records its latency under `label`.
+    The operation is written against the query builder, e.g.
+    `lambda db: db.table("students").select("*").eq("student_id", sid).execute()`.
+    """
+    if _async_client is None:
+        # Not serving (or not started yet): keep the caller working on the blocking client
+        return await asyncio.to_thread(db_call_sync, label, operation)
+    started = time.perf_counter()
+    try:
+        async with _slots:
+            result = await asyncio.wait_for(operation(_async_client), SUPABASE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _record(label, started, "timeouts")
+        raise TimeoutError(f"Supabase call '{label}' timed out after {SUPABASE_TIMEOUT_SECONDS}s")
+    except Exception:
+        _record(label, started, "errors")
+        raise
+    _record(label, started, "ok")
+    return result
+
+
+def db_call_sync(label: str, operation: Callable[[Any], Any]) -> Any:
+    """
+    Blocking adapter for sync code such as LangChain tools running in worker threads.
+    Hands the call to the serving loop so it shares the async pool; falls back to the
+    blocking client when there is no loop, or when called on the loop thread itself.
+    """
+    loop = _loop
+    if loop is not None and _async_client is not None:
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if not on_loop:
+            future = asyncio.run_coroutine_threadsafe(db_call(label, operation), loop)
+            return future.result()
+
+    started = time.perf_counter()
+    try:
+        result = operation(supabase)
+    except Exception:
+        _record(label, started, "errors")
+        raise
+    _record(label, started, "ok")
+    return result
+
+
+def get_db_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            label: {
+                "calls": int(s["calls"]),
+                "errors": int(s["errors"]),
+                "timeouts": int(s["timeouts"]),
+                "avg_ms": round(s["total_ms"] / s["calls"], 1) if s["calls"] else 0.0,
+                "max_ms": round(s["max_ms"], 1),
+            }
+            for label, s in _stats.items()
+        }
@@ -0,0 +1,89 @@
+import os
+import json
+import asyncio
+import contextvars
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.messages import ToolMessage
+
+# Blocking I/O tools (Stripe, Supabase, Google, Tavily, httpx) share this pool.
+# OCR and face matching only wait here; the work itself runs in services/vision/worker_pool.py
+TOOL_THREAD_WORKERS = int(os.getenv("TOOL_THREAD_WORKERS", "16"))
+# Upper bound for a single tool call before we give up on it
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "60"))
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+class ToolArgumentError(Exception):
+    """Raised by an argument hook when a tool call can't be run; the message goes back to the LLM"""
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=TOOL_THREAD_WORKERS, thread_name_prefix="tool")
+    return _thread_pool
+
+
+async def run_tool(tool, args: Dict[str, Any]):
+    """Runs one tool without blocking the event loop"""
+    if getattr(tool, "coroutine", None) is not None:
+        return await tool.ainvoke(args)
+
+    loop = asyncio.get_running_loop()
+    # Copy the context so LangChain callbacks (astream_events) still see this run
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_get_thread_pool(), ctx.run, tool.invoke, args)
+
+
+async def _execute_one(tool_call: Dict[str, Any], tools_map: Dict[str, Any], prepare_args: Optional[Callable]):
+    tool_name = tool_call["name"]
+    try:
+        if tool_name not in tools_map:
+            return f"Unknown tool: {tool_name}"
+        args = dict(tool_call.get("args") or {})
+        if prepare_args:
+            args = prepare_args(tool_name, args)
+        print(f"   ▶ Executing: {tool_name}")
+        return await asyncio.wait_for(run_tool(tools_map[tool_name], args), TOOL_TIMEOUT_SECONDS)
+    except ToolArgumentError as e:
+        return f"Error: {e}"
+    except asyncio.TimeoutError:
+        print(f"   ❌ TIMEOUT IN TOOL: {tool_name}")
+        return f"System Error executing {tool_name}: timed out after {TOOL_TIMEOUT_SECONDS:.0f}s"
+    except Exception as e:
+        # Return the error to the LLM so it can apologize to the user
+        print(f"   ❌ CRASH IN TOOL: {e}")
+        print(f"   📝 Trace: {traceback.format_exc()}")
+        return f"System Error executing {tool_name}: {str(e)}"
+
+
+async def execute_tool_calls(
+    tool_calls: List[Dict[str, Any]],
+    tools_map: Dict[str, Any],
+    prepare_args: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None,
+) -> List[Tuple[Dict[str, Any], Any]]:
+    """
+    Runs every tool call of one AIMessage concurrently.
+    prepare_args(name, args) may fill in arguments from state or raise ToolArgumentError.
+    Returns (tool_call, result) pairs in the original order; failures come back as error strings.
+    """
+    results = await asyncio.gather(
+        *(_execute_one(tool_call, tools_map, prepare_args) for tool_call in tool_calls)
+    )
+    return list(zip(tool_calls, results))
+
+
+def tool_message(tool_call: Dict[str, Any], result: Any) -> ToolMessage:
+    content = json.dumps(result, default=str) if isinstance(result, (dict, list)) else str(result)
+    return ToolMessage(content=content, tool_call_id=tool_call["id"], name=tool_call["name"])
+
+
+def shutdown_tool_pools():
+    """Stops the worker pool. Call on app shutdown."""
+    global _thread_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
@@ -0,0 +1,70 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+# Perceptual hashes of ID uploads, so a card re-uploaded in the same conversation reuses
+# the earlier stored object instead of being uploaded again. Extraction and the face
+# check still run on every upload.
+UPLOAD_INDEX_PATH = os.getenv("UPLOAD_INDEX_PATH", "upload_index.sqlite")
+# Differing bits (of 256) still counted as the same photo. Cards share one template, so
+# near-matches are only looked for among the uploads of the same conversation: another
+# student's card must never be mistaken for this one.
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "12"))
+UPLOAD_INDEX_RETENTION_DAYS = float(os.getenv("UPLOAD_INDEX_RETENTION_DAYS", "30"))
+
+
+class UploadIndex:
+    """Maps perceptual hashes of uploaded ID cards, per conversation, to their stored URL"""
+
+    def __init__(self, path: str = UPLOAD_INDEX_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS uploads "
+            "(url TEXT PRIMARY KEY, phash TEXT NOT NULL, created_at REAL NOT NULL, owner TEXT)"
+        )
+        # Indexes created before uploads were scoped: their rows have no owner and never match
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(uploads)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE uploads ADD COLUMN owner TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS uploads_owner ON uploads (owner)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "duplicates": 0}
+
+    def find_duplicate(self, phash: int, owner: str) -> Optional[str]:
+        """URL of an earlier upload of (nearly) the same photo by the same `owner` (conversation), or None"""
+        cutoff = time.time() - UPLOAD_INDEX_RETENTION_DAYS * 86400
+        with self._lock:
+            self.stats["lookups"] += 1
+            rows = self._db.execute(
+                "SELECT url, phash FROM uploads WHERE owner = ? AND created_at > ?", (owner, cutoff)
+            ).fetchall()
+            best_url, best_distance = None, PHASH_MAX_DISTANCE + 1
+            for url, stored in rows:
+                distance = (int(stored, 16) ^ phash).bit_count()
+                if distance < best_distance:
+                    best_url, best_distance = url, distance
+            if best_url is not None:
+                self.stats["duplicates"] += 1
+                print(f"♻️ Re-uploaded ID card recognised ({best_distance} bits apart)")
+            return best_url
+
+    def add(self, url: str, phash: int, owner: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads (url, phash, created_at, owner) VALUES (?, ?, ?, ?)",
+                (url, format(phash, "x"), time.time(), owner),
+            )
+            self._db.execute("DELETE FROM uploads WHERE created_at < ?", (time.time() - UPLOAD_INDEX_RETENTION_DAYS * 86400,))
+            self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
+
+
+# Shared instance used by the upload path
+upload_index = UploadIndex()
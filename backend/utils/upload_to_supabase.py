@@ -1,34 +1,107 @@
-from .supabase_client import supabase
+from .supabase_client import supabase, db_call
+from .image_normalizer import normalize_image, perceptual_hash, DecompressionBombError
+from .image_cache import image_cache
+from .upload_index import upload_index
 from fastapi import UploadFile
 import asyncio
 import os
-from pathlib import Path
 import uuid
+from typing import BinaryIO, Optional
 
 BUCKET = os.getenv("SUPABASE_BUCKET", "uploads")
+# Uploads larger than this are rejected before anything is stored. The request body
+# itself is capped a little above this by RequestSizeLimitMiddleware (utils/body_limit.py).
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
 
-async def upload_file_to_supabase(file: UploadFile) -> str:
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+def upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, os.SEEK_END)
+    return file.file.tell()
+
+
+def open_upload(file: UploadFile) -> BinaryIO:
+    """
+    A reader over the temp file Starlette already spooled the upload to, so it is
+    neither copied again nor read into memory. Rewind it before each use.
+    """
+    # fileno() moves a small, still in-memory upload to disk first
+    return os.fdopen(os.dup(file.file.fileno()), "rb")
+
+
+async def upload_file_to_supabase(file: UploadFile, dedupe: bool = False, owner: Optional[str] = None) -> str:
     """
     Uploads an UploadFile object to Supabase Storage asynchronously
     and returns the public URL of the uploaded file.
+    Images are also stored as an upright, downsized JPEG next to the original,
+    and that normalized copy's URL is returned for the vision tools to use.
+    With `dedupe` (ID cards) and an `owner` (the conversation), a photo already uploaded
+    in that conversation is not stored again and the earlier URL comes back.
+    Uploads from other conversations are never matched.
     """
-    file_bytes = await file.read()
-    unique_name = f"{uuid.uuid4()}{file.filename}"
+    upload_id = uuid.uuid4()
+    unique_name = f"{upload_id}{file.filename}"
+    normalized_name = f"{upload_id}-normalized.jpg"
 
-    loop = asyncio.get_event_loop()
+    if upload_size(file) > UPLOAD_MAX_BYTES:
+        raise UploadTooLargeError(f"File is larger than the {UPLOAD_MAX_BYTES // (1024 * 1024)} MB limit")
 
+    source = open_upload(file)
     try:
-        # Run sync upload in a separate thread to avoid blocking the event loop
-        await loop.run_in_executor(
-            None,
-            lambda: supabase.storage.from_(BUCKET).upload(
-                unique_name,
-                file_bytes,
-                {"content-type": file.content_type}
+        phash = None
+        if dedupe and owner:
+            source.seek(0)
+            phash = await asyncio.to_thread(perceptual_hash, source)
+        if phash is not None:
+            previous = await asyncio.to_thread(upload_index.find_duplicate, phash, owner)
+            if previous:
+                return previous
+
+        source.seek(0)
+        normalized = await asyncio.to_thread(normalize_image, source)
+        source.seek(0)
+
+        uploads = [
+            # Async storage client from the shared pool, so the upload never blocks the event loop
+            db_call(
+                "storage.upload",
+                lambda db: db.storage.from_(BUCKET).upload(
+                    unique_name,
+                    source,
+                    {"content-type": file.content_type}
+                )
             )
-        )
+        ]
+        if normalized is not None:
+            uploads.append(db_call(
+                "storage.upload_normalized",
+                lambda db: db.storage.from_(BUCKET).upload(
+                    normalized_name,
+                    normalized,
+                    {"content-type": "image/jpeg"}
+                )
+            ))
+        await asyncio.gather(*uploads)
+    except DecompressionBombError as e:
+        # A small file can still declare an enormous canvas; refuse it like an oversized upload
+        raise UploadTooLargeError(f"Image dimensions are too large: {e}") from e
     except Exception as e:
         print("Supabase upload failed:", e)
         raise e
+    finally:
+        source.close()
 
-    return supabase.storage.from_(BUCKET).get_public_url(unique_name)
\ No newline at end of file
+    # Building the public URL is string formatting, no request is made
+    if normalized is None:
+        return supabase.storage.from_(BUCKET).get_public_url(unique_name)
+    url = supabase.storage.from_(BUCKET).get_public_url(normalized_name)
+    # The vision tools will ask for this image next; spare them the download
+    await asyncio.to_thread(image_cache.put, url, normalized, "image/jpeg")
+    if phash is not None:
+        await asyncio.to_thread(upload_index.add, url, phash, owner)
+    return url